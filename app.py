@@ -1,28 +1,153 @@
 import streamlit as st
-from rdflib import Graph, Namespace, RDFS
+from rdflib import Namespace, RDFS
 import os
+import time
 from src.wiki_browser import show_wiki
 from src.sparql_console import show_console
+from src.analytics import show_analytics, build_analytics
+from src.graph_explorer import show_explorer, build_adjacency_index
+from src.entity_pages import show_entity_page, build_entity_store, QUERY_PARAM
+from src.admin_page import show_admin
+from src.releases import InternedGraph, build_release_dataset, release_iri, release_names, release_paths
+from src.rewriter import collect_statistics
+from src.query_log import record_graph_load, start_metrics_server
+from src.product_table import build_product_table
+from src.rank_index import build_rank_index
+from src.name_search import build_name_search
+from src.bitmap_index import build_bitmap_index
+from src.similarity import build_similarity_index
 
 EX = Namespace("http://example.org/gpu/")
 SCHEMA = Namespace("https://schema.org/")
 
+TTL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gpu_data.ttl")
+# Materialized RDFS / owl:sameAs inferences (preprocessing/to_rdf.py), loaded when present
+INFERRED_TTL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gpu_inferred.ttl")
+
 st.set_page_config(layout="wide", page_title="GPU-LD Hub")
 
-@st.cache_resource
-def load_graph():
-    g = Graph()
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    ttl_path = os.path.join(base_path, "data", "gpu_data.ttl")
-    g.parse(ttl_path, format="turtle")
+# Per-release caches kept besides the current data's, so switching back and forth does not rebuild
+CACHED_RELEASES = 2
+
+def graph_version(paths=(TTL_PATH, INFERRED_TTL_PATH)):
+    """Identifies the data files' contents; a regenerated TTL or a new release gets a new version."""
+    parts = []
+    for path in (*paths, *release_paths()):
+        if os.path.exists(path):
+            info = os.stat(path)
+            parts.append(f"{info.st_mtime_ns}-{info.st_size}")
+    return "-".join(parts)
+
+# Everything derived from the graph is cached per graph version, older versions are dropped
+@st.cache_resource(max_entries=1)
+def load_graph(version):
+    start = time.perf_counter()
+    # terms are interned so the releases (load_release_dataset) can share them
+    g = InternedGraph()
+    g.parse(TTL_PATH, format="turtle")
+    if os.path.exists(INFERRED_TTL_PATH):
+        g.parse(INFERRED_TTL_PATH, format="turtle")
+    record_graph_load(time.perf_counter() - start)
     return g
 
-g = load_graph()
+@st.cache_resource(max_entries=1)
+def load_release_dataset(_g, version):
+    return build_release_dataset(_g)
+
+@st.cache_resource(max_entries=1)
+def load_statistics(_g, version):
+    return collect_statistics(_g)
+
+@st.cache_resource(max_entries=1 + CACHED_RELEASES)
+def load_product_table(_g, version):
+    return build_product_table(_g, version)
+
+@st.cache_resource(max_entries=1 + CACHED_RELEASES)
+def load_rank_index(_products, version):
+    return build_rank_index(_products)
+
+@st.cache_resource(max_entries=1 + CACHED_RELEASES)
+def load_name_search(_products, version):
+    return build_name_search(_products)
+
+@st.cache_resource(max_entries=1 + CACHED_RELEASES)
+def load_bitmap_index(_products, version):
+    return build_bitmap_index(_products)
+
+@st.cache_resource(max_entries=1 + CACHED_RELEASES)
+def load_similarity_index(_products, version):
+    return build_similarity_index(_products)
+
+@st.cache_resource(max_entries=1)
+def load_adjacency_index(_g, version):
+    return build_adjacency_index(_g, version)
+
+@st.cache_resource(max_entries=1)
+def load_entity_store(_g, version):
+    return build_entity_store(_g, version)
+
+@st.cache_resource(max_entries=1)
+def load_analytics(_products, version):
+    return build_analytics(_products)
+
+start_metrics_server()
+version = graph_version()
+g = load_graph(version)
+dataset = load_release_dataset(g, version)
+stats = load_statistics(g, version)
+products = load_product_table(g, version)
+rank_index = load_rank_index(products, version)
+name_search = load_name_search(products, version)
+bitmaps = load_bitmap_index(products, version)
+similarity = load_similarity_index(products, version)
 
 st.sidebar.title("GPU-LD Hub")
-page = st.sidebar.radio("Navigation", ["SPARQL Endpoint", "GPU Encyclopedia"])
+pages = ["SPARQL Endpoint", "GPU Encyclopedia", "GPU Details", "Analytics", "Graph Explorer", "Admin"]
+# a link to a card (?gpu=...) opens its detail page
+if "nav_page" not in st.session_state:
+    st.session_state.nav_page = "GPU Details" if QUERY_PARAM in st.query_params else pages[0]
+page = st.sidebar.radio("Navigation", pages, key="nav_page")
+if page != "GPU Details" and QUERY_PARAM in st.query_params:
+    del st.query_params[QUERY_PARAM]
 
 if page == "GPU Encyclopedia":
-    show_wiki(g, EX, SCHEMA)
+    releases = release_names(dataset)
+    release = st.sidebar.selectbox("Release:", [None, *releases], format_func=lambda r: r or "Current",
+                                   key="wiki_release") if releases else None
+    if release is None:
+        show_wiki(g, EX, SCHEMA, products=products, rank_index=rank_index,
+                  name_search=name_search, bitmaps=bitmaps, similarity=similarity)
+    else:
+        # an older release: the same indexes over its named graph, cached next to the current ones
+        release_g = dataset.graph(release_iri(release))
+        release_version = f"{version}@{release}"
+        release_products = load_product_table(release_g, release_version)
+        show_wiki(release_g, EX, SCHEMA, products=release_products,
+                  rank_index=load_rank_index(release_products, release_version),
+                  name_search=load_name_search(release_products, release_version),
+                  bitmaps=load_bitmap_index(release_products, release_version),
+                  similarity=load_similarity_index(release_products, release_version))
+elif page == "GPU Details":
+    show_entity_page(load_entity_store(g, version))
+elif page == "Analytics":
+    show_analytics(g, products=products, analytics=load_analytics(products, version))
+elif page == "Graph Explorer":
+    show_explorer(g, adjacency=load_adjacency_index(g, version))
+elif page == "Admin":
+    # the lazily loaded page caches are built here if no page has needed them yet
+    show_admin(g, {
+        "load_graph": g,
+        "load_release_dataset": dataset,
+        "load_statistics": stats,
+        "load_product_table": products,
+        "load_rank_index": rank_index,
+        "load_name_search": name_search,
+        "load_bitmap_index": bitmaps,
+        "load_similarity_index": similarity,
+        "load_entity_store": load_entity_store(g, version),
+        "load_adjacency_index": load_adjacency_index(g, version),
+        "load_analytics": load_analytics(products, version),
+    })
 else:
-    show_console(g)
\ No newline at end of file
+    # the dataset queries the current data by default and the releases with GRAPH
+    show_console(dataset, stats=stats, version=version)
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Compares the ways of evaluating a SERVICE query against a local stand-in
+endpoint (src/sparql_endpoint.py) and checks that all return the same rows:
+rdflib's own evaluation, one request per binding over a pooled session,
+VALUES batches, concurrent batches, and batches answered from the cache.
+
+    python -m benchmarks.bench_federation [--latency-ms 20] [--batch 100] [--concurrency 4] [--skip-native]
+"""
+import argparse
+import time
+from collections import Counter
+from rdflib.plugins.sparql import CUSTOM_EVALS
+from src import federation
+from src.batch_runner import DATA_PATHS, load_graph
+from src.federation import ServiceCache, ServiceClient
+from src.sparql_endpoint import endpoint_url, serve, synthetic_inventory
+
+QUERY = """PREFIX schema: <https://schema.org/>
+PREFIX ex: <http://example.org/gpu/>
+PREFIX inv: <http://example.org/inventory/>
+SELECT ?name ?stock ?warehouse WHERE {
+  { ?gpu schema:manufacturer ex:NVIDIA ; schema:name ?name ; ex:releaseYear ?year . FILTER(?year >= 2020) }
+  SERVICE <%s> { ?gpu inv:stock ?stock ; inv:warehouse ?warehouse . }
+}"""
+
+
+def run(g, server, query, fed_client=None):
+    """(seconds, rows, requests, new connections) of one evaluation; fed_client None is rdflib's own."""
+    requests_before, connections_before = server.requests, server.connections
+    evaluator = CUSTOM_EVALS.pop("federation") if fed_client is None else None
+    previous = federation.use_client(fed_client)
+    try:
+        t = time.perf_counter()
+        rows = [tuple(r) for r in g.query(query)]
+        elapsed = time.perf_counter() - t
+    finally:
+        federation.use_client(previous)
+        if evaluator is not None:
+            CUSTOM_EVALS["federation"] = evaluator
+    return elapsed, rows, server.requests - requests_before, server.connections - connections_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="delay of the endpoint per response")
+    parser.add_argument("--batch", type=int, default=federation.BATCH_SIZE, help="join keys per request")
+    parser.add_argument("--concurrency", type=int, default=federation.MAX_CONCURRENT_REQUESTS,
+                        help="requests in flight for the concurrent strategy")
+    parser.add_argument("--skip-native", action="store_true", help="leave out rdflib's own (slowest) evaluation")
+    args = parser.parse_args()
+
+    g = load_graph(DATA_PATHS)
+    server = serve(synthetic_inventory(g), port=0, latency_s=args.latency_ms / 1000)
+    url = endpoint_url(server)
+    query = QUERY % url
+    print(f"stand-in endpoint on {url}, {args.latency_ms:g} ms per response")
+
+    warm = ServiceClient([url], args.batch, args.concurrency, cache=ServiceCache(path=None))
+    strategies = [
+        ("per binding", ServiceClient([url], batch_size=1, max_concurrency=1)),
+        (f"batches of {args.batch}", ServiceClient([url], args.batch, max_concurrency=1)),
+        # smaller batches, so there are several to send at once
+        (f"{args.concurrency} x batches of {max(args.batch // args.concurrency, 1)}",
+         ServiceClient([url], max(args.batch // args.concurrency, 1), args.concurrency)),
+        ("cold cache", warm),
+        ("warm cache", warm),
+    ]
+    if not args.skip_native:
+        strategies.insert(0, ("rdflib", None))
+
+    ok = True
+    expected = None
+    for name, fed_client in strategies:
+        elapsed, rows, requests, connections = run(g, server, query, fed_client)
+        expected = Counter(rows) if expected is None else expected
+        same = Counter(rows) == expected
+        ok &= same
+        print(f"{name:22} rows={len(rows):5} {elapsed:7.2f}s requests={requests:5} connections={connections:5} "
+              f"{'same results' if same else 'RESULTS DIFFER'}")
+
+    server.shutdown()
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares the encyclopedia queries as written with their rewritten form
+(src/rewriter.py) and checks that both return the same rows.
+
+    python -m benchmarks.bench_rewriter [--repeat N]
+"""
+import argparse
+import os
+import time
+from collections import Counter
+from rdflib import Graph
+from src.rewriter import collect_statistics, optimized_query
+from src.queries import build_wiki_query
+
+TTL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gpu_data.ttl")
+
+CASES = [
+    ("All", None),
+    ("Brand", "NVIDIA"),
+    ("Architecture", "Ada Lovelace"),
+    ("Release Year", "2020"),
+    ("Memory Size", "mem_size_8_GB"),
+    ("Memory Type", "GDDR6"),
+    ("Memory Bus", "memBus_256"),
+]
+RANKINGS = ["schema:name", "ex:tdpWatts"]
+
+
+def timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query, the best time is reported")
+    args = parser.parse_args()
+
+    g = Graph()
+    g.parse(TTL_PATH, format="turtle")
+    t = time.perf_counter()
+    stats = collect_statistics(g)
+    print(f"statistics collected in {time.perf_counter() - t:.3f} s")
+
+    ok = True
+    for ranking in RANKINGS:
+        for filter_type, filter_value in CASES:
+            query = build_wiki_query(filter_type, filter_value, ranking)
+            t_orig, rows_orig = timed(lambda: [tuple(r) for r in g.query(query)], args.repeat)
+            t_new, rows_new = timed(lambda: [tuple(r) for r in g.query(optimized_query(g, query, stats))], args.repeat)
+
+            same = Counter(rows_orig) == Counter(rows_new)
+            ok &= same
+            print(f"{ranking:12} {filter_type:13} rows={len(rows_orig):5} "
+                  f"original={t_orig:.3f}s rewritten={t_new:.3f}s speedup={t_orig / t_new:5.1f}x "
+                  f"{'same results' if same else 'RESULTS DIFFER'}")
+
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
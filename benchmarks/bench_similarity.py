@@ -0,0 +1,89 @@
+"""
+Times the "Similar GPUs" search (src/similarity.py) against a per-pair
+Python scan as the catalogue grows, and checks that both agree.
+
+    python -m benchmarks.bench_similarity [--scales 1 10 100] [--queries N]
+"""
+import argparse
+import copy
+import os
+import time
+import numpy as np
+from rdflib import Graph
+from src.product_table import build_product_table
+from src.similarity import MIN_SHARED, build_similarity_index
+
+TTL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gpu_data.ttl")
+
+# the pairwise scan is only run up to this many products
+SCAN_LIMIT = 40_000
+
+
+def replicated(table, scale):
+    """The product table with every row repeated scale times."""
+    big = copy.copy(table)
+    big.iris = np.tile(table.iris, scale)
+    big.columns = {name: np.tile(values, scale) for name, values in table.columns.items()}
+    return big
+
+
+def scan_distances(index, row):
+    """Reference: one product pair at a time."""
+    result = np.full(len(index.values), np.inf)
+    for i in range(len(index.values)):
+        shared = index.present[i] & index.present[row]
+        n = shared.sum()
+        if i != row and n >= MIN_SHARED:
+            diff = index.values[i, shared] - index.values[row, shared]
+            result[i] = np.sqrt((diff ** 2).sum() * len(index.columns) / n)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="catalogue size multipliers")
+    parser.add_argument("--queries", type=int, default=20, help="query cards per scale")
+    args = parser.parse_args()
+
+    g = Graph()
+    g.parse(TTL_PATH, format="turtle")
+    table = build_product_table(g)
+    rng = np.random.default_rng(0)
+
+    ok = True
+    for scale in args.scales:
+        products = replicated(table, scale)
+        t = time.perf_counter()
+        index = build_similarity_index(products)
+        build_s = time.perf_counter() - t
+        rows = rng.choice(len(products), args.queries, replace=False)
+
+        t = time.perf_counter()
+        for row in rows:
+            index.nearest(row)
+        query_s = (time.perf_counter() - t) / len(rows)
+
+        t = time.perf_counter()
+        index.nearest_batch(rows)
+        batch_s = (time.perf_counter() - t) / len(rows)
+
+        line = (f"products={len(products):8,} build={build_s * 1000:8.1f}ms "
+                f"query={query_s * 1000:7.2f}ms batched={batch_s * 1000:7.2f}ms/query")
+        if len(products) <= SCAN_LIMIT:
+            t = time.perf_counter()
+            reference = scan_distances(index, rows[0])
+            scan_s = time.perf_counter() - t
+            distances = index.distances(rows[:1])[0]
+            distances[rows[0]] = np.inf
+            same = np.array_equal(np.isfinite(reference), np.isfinite(distances)) and np.allclose(
+                reference[np.isfinite(reference)], distances[np.isfinite(reference)], atol=1e-6)
+            ok &= same
+            line += f" scan={scan_s * 1000:9.1f}ms {'same distances' if same else 'DISTANCES DIFFER'}"
+        print(line)
+
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
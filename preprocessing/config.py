@@ -5,6 +5,15 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RAW_CSV_PATH = os.path.join(BASE_DIR, '..', 'data', 'gpu_1986-2026.csv')
 PROCESSED_CSV_PATH = os.path.join(BASE_DIR, '..', 'data', 'gpu_info_cleaned.csv')
 OUTPUT_RDF_PATH = os.path.join(BASE_DIR, '..', 'data', 'gpu_data.ttl')
+# Triples added by the reasoning stage of to_rdf.py (skipped with --no-infer), loaded next to OUTPUT_RDF_PATH by the app
+INFERRED_RDF_PATH = os.path.join(BASE_DIR, '..', 'data', 'gpu_inferred.ttl')
+# Published releases (to_rdf.py --release NAME), one named graph per TriG file, loaded as named graphs by the app
+RELEASES_DIR = os.path.join(BASE_DIR, '..', 'data', 'releases')
+
+# Offline Wikidata linking (linkset_builder.py)
+WIKIDATA_EXTRACT_PATH = os.environ.get('WIKIDATA_EXTRACT', os.path.join(BASE_DIR, '..', 'data', 'wikidata_extract.json.gz'))
+LABEL_INDEX_PATH = os.path.join(BASE_DIR, '..', 'data', 'wikidata_labels.sqlite')
+GENERATED_LINKSET_PATH = os.path.join(BASE_DIR, 'linkset_generated.py')
 
 KEEP_COLUMNS = [
     'Brand',
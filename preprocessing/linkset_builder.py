@@ -0,0 +1,269 @@
+"""
+Builds the Wikidata linkset offline from a local Wikidata extract.
+
+    python linkset_builder.py [extract] [--rebuild-index] [--min-confidence 0.8]
+
+The extract is streamed line by line and may be a JSON dump (one entity per
+line, as in latest-all.json) or N-Triples (rdfs:label / skos:altLabel /
+schema:description), optionally .gz or .bz2 compressed. English labels and
+aliases go into an on-disk SQLite index, which is then used to match every
+distinct brand, architecture and GPU codename of the cleaned table. The
+result is written to linkset_generated.py, which to_rdf.py prefers over the
+hand-maintained Linkset.py.
+"""
+import argparse
+import bz2
+import difflib
+import gzip
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+import pandas as pd
+from config import PROCESSED_CSV_PATH, WIKIDATA_EXTRACT_PATH, LABEL_INDEX_PATH, GENERATED_LINKSET_PATH
+from Linkset import BRAND_LINKS, ARCH_LINKS
+
+WIKIDATA_ENTITY = "https://www.wikidata.org/entity/"
+
+# Cleaned table column -> name of the dict in the generated linkset
+MATCH_COLUMNS = {
+    "brand": "BRAND_LINKS",
+    "architecture": "ARCH_LINKS",
+    "gpu_codename": "CODENAME_LINKS",
+}
+
+# Words in an entity description that make it a plausible match for the column
+DESCRIPTION_HINTS = {
+    "brand": ("company", "manufacturer", "corporation", "business", "enterprise"),
+    "architecture": ("microarchitecture", "architecture", "gpu", "graphics"),
+    "gpu_codename": ("gpu", "graphics", "processor", "chip", "apu"),
+}
+
+# Scores: exact label, exact alias, then fuzzy ratio scaled by FUZZY_WEIGHT
+LABEL_SCORE = 1.0
+ALIAS_SCORE = 0.95
+FUZZY_WEIGHT = 0.9
+MIN_FUZZY_RATIO = 0.85
+HINT_BONUS = 0.05
+# a description without any hint (e.g. "Scottish physicist" for Maxwell) is evidence against the match
+NO_HINT_PENALTY = 0.25
+MIN_CONFIDENCE = 0.8
+FUZZY_CANDIDATES = 25
+
+BATCH_SIZE = 50_000
+
+_NT_LINE = re.compile(
+    r'^<http://www\.wikidata\.org/entity/(Q\d+)> <([^>]+)> "((?:[^"\\]|\\.)*)"@en(?:-[a-z]+)? \.\s*$')
+_NT_PREDICATES = {
+    "http://www.w3.org/2000/01/rdf-schema#label": "label",
+    "http://www.w3.org/2004/02/skos/core#altLabel": "alias",
+    "http://schema.org/description": "description",
+    "https://schema.org/description": "description",
+}
+
+
+def normalize(text):
+    """Case, accent and punctuation insensitive form of a name."""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^0-9a-z]+", " ", text.lower()).strip()
+
+
+def trigrams(norm):
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def numbers(norm):
+    """Digit groups of a name; version and model numbers must agree for a fuzzy match."""
+    return re.findall(r"\d+", norm)
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def iter_entries(path):
+    """Streams (qid, kind, text) with kind label / alias / description, English only."""
+    with _open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("<"):
+                m = _NT_LINE.match(line)
+                if m and m.group(2) in _NT_PREDICATES:
+                    yield m.group(1), _NT_PREDICATES[m.group(2)], json.loads(f'"{m.group(3)}"')
+                continue
+            line = line.rstrip(",")
+            if not line.startswith("{"):
+                continue
+            entity = json.loads(line)
+            qid = entity.get("id")
+            label = entity.get("labels", {}).get("en")
+            if label:
+                yield qid, "label", label["value"]
+            for alias in entity.get("aliases", {}).get("en", []):
+                yield qid, "alias", alias["value"]
+            description = entity.get("descriptions", {}).get("en")
+            if description:
+                yield qid, "description", description["value"]
+
+
+def build_label_index(extract_path, index_path=LABEL_INDEX_PATH):
+    """Loads the extract into the SQLite label index, in batches."""
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    conn = sqlite3.connect(index_path)
+    conn.executescript("""
+        CREATE TABLE names (norm TEXT, qid TEXT, label TEXT, is_alias INTEGER);
+        CREATE TABLE descriptions (qid TEXT PRIMARY KEY, description TEXT);
+        CREATE TABLE grams (gram TEXT, norm TEXT);
+    """)
+    names, descriptions, grams = [], [], []
+    seen_norms = set()
+    count = 0
+
+    def flush():
+        conn.executemany("INSERT INTO names VALUES (?, ?, ?, ?)", names)
+        conn.executemany("INSERT OR REPLACE INTO descriptions VALUES (?, ?)", descriptions)
+        conn.executemany("INSERT INTO grams VALUES (?, ?)", grams)
+        names.clear(), descriptions.clear(), grams.clear()
+
+    for qid, kind, text in iter_entries(extract_path):
+        if kind == "description":
+            descriptions.append((qid, text))
+        else:
+            norm = normalize(text)
+            if not norm:
+                continue
+            names.append((norm, qid, text, int(kind == "alias")))
+            if norm not in seen_norms:
+                seen_norms.add(norm)
+                grams.extend((gram, norm) for gram in trigrams(norm))
+            count += 1
+        if len(names) + len(grams) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    conn.executescript("""
+        CREATE INDEX names_norm ON names (norm);
+        CREATE INDEX grams_gram ON grams (gram);
+    """)
+    conn.commit()
+    print(f"Indexed {count:,} labels and aliases ({len(seen_norms):,} distinct) into {index_path}")
+    return conn
+
+
+def _score(conn, column, candidates):
+    """Best (confidence, qid, matched label) among [(qid, label, base score)]."""
+    best = None
+    for qid, label, score in candidates:
+        row = conn.execute("SELECT description FROM descriptions WHERE qid = ?", (qid,)).fetchone()
+        if row and any(hint in row[0].lower() for hint in DESCRIPTION_HINTS[column]):
+            score += HINT_BONUS
+        elif row:
+            score -= NO_HINT_PENALTY
+        # ranked before capping so the hint decides between equal names;
+        # lower QIDs are older, usually the main entity of a name
+        key = (score, -int(qid[1:]))
+        if best is None or key > best[0]:
+            best = (key, qid, label)
+    return min(best[0][0], 1.0), best[1], best[2]
+
+
+def match_name(conn, name, column):
+    """(confidence, qid, matched label) for one name, or None."""
+    norm = normalize(name)
+    if not norm:
+        return None
+    exact = conn.execute("SELECT qid, label, is_alias FROM names WHERE norm = ?", (norm,)).fetchall()
+    if exact:
+        return _score(conn, column, [(q, l, ALIAS_SCORE if a else LABEL_SCORE) for q, l, a in exact])
+
+    grams = list(trigrams(norm))
+    placeholders = ",".join("?" * len(grams))
+    shared = conn.execute(
+        f"SELECT norm, COUNT(*) AS n FROM grams WHERE gram IN ({placeholders}) "
+        f"GROUP BY norm ORDER BY n DESC LIMIT {FUZZY_CANDIDATES}", grams).fetchall()
+    candidates = []
+    for other, _ in shared:
+        if numbers(other) != numbers(norm):
+            continue
+        ratio = difflib.SequenceMatcher(None, norm, other).ratio()
+        if ratio < MIN_FUZZY_RATIO:
+            continue
+        for qid, label, _ in conn.execute("SELECT qid, label, is_alias FROM names WHERE norm = ?", (other,)):
+            candidates.append((qid, label, ratio * FUZZY_WEIGHT))
+    return _score(conn, column, candidates) if candidates else None
+
+
+def match_table(conn, df, min_confidence=MIN_CONFIDENCE):
+    """{column: {name: (url or None, confidence, matched label)}} for all distinct values."""
+    manual = {"brand": BRAND_LINKS, "architecture": ARCH_LINKS}
+    result = {}
+    for column in MATCH_COLUMNS:
+        links = {}
+        for name in sorted(df[column].dropna().unique()):
+            # curated links win over matching
+            if manual.get(column, {}).get(name):
+                links[name] = (manual[column][name], 1.0, "manual")
+                continue
+            match = match_name(conn, name, column)
+            if match and match[0] >= min_confidence:
+                confidence, qid, label = match
+                links[name] = (WIKIDATA_ENTITY + qid, confidence, label)
+            else:
+                links[name] = (None, match[0] if match else 0.0, match[2] if match else None)
+        result[column] = links
+        found = sum(url is not None for url, _, _ in links.values())
+        print(f"{column}: {found}/{len(links)} linked")
+    return result
+
+
+def write_linkset(result, path=GENERATED_LINKSET_PATH):
+    lines = [
+        "# Generated by linkset_builder.py from a local Wikidata extract - do not edit by hand,",
+        "# curated links belong in Linkset.py. Comments: confidence and the matched label.",
+        "",
+    ]
+    for column, variable in MATCH_COLUMNS.items():
+        lines.append(f"{variable} = {{")
+        for name, (url, confidence, label) in result[column].items():
+            lines.append(f"    {name!r}: {url!r},  # {confidence:.2f} {label or '-'}")
+        lines += ["}", ""]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    print(f"Saved to: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("extract", nargs="?", default=WIKIDATA_EXTRACT_PATH, help="Wikidata JSON or N-Triples extract")
+    parser.add_argument("--rebuild-index", action="store_true", help="reload the extract even if the index exists")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    try:
+        df = pd.read_csv(PROCESSED_CSV_PATH)
+    except FileNotFoundError:
+        print(f"Error: File {PROCESSED_CSV_PATH} not found.")
+        return
+
+    if args.rebuild_index or not os.path.exists(LABEL_INDEX_PATH):
+        if not os.path.exists(args.extract):
+            print(f"Error: Wikidata extract {args.extract} not found.")
+            return
+        conn = build_label_index(args.extract)
+    else:
+        conn = sqlite3.connect(LABEL_INDEX_PATH)
+
+    write_linkset(match_table(conn, df, args.min_confidence))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
+    print("\nlinkset builder - all done\n")
@@ -0,0 +1,133 @@
+"""
+Forward-chaining of a bounded RDFS + owl:sameAs rule set with semi-naive
+evaluation: every round only joins the triples derived in the previous
+round (the delta) against the whole closure, so each combination of
+premises is considered once.
+
+Rules (RDF 1.1 Semantics / OWL 2 RL names):
+    rdfs2   p rdfs:domain c, s p o           -> s rdf:type c
+    rdfs3   p rdfs:range c,  s p o (o an IRI) -> o rdf:type c
+    rdfs5   subPropertyOf transitivity
+    rdfs7   p rdfs:subPropertyOf q, s p o     -> s q o
+    rdfs9   c rdfs:subClassOf d, s rdf:type c -> s rdf:type d
+    rdfs11  subClassOf transitivity
+    eq-sym, eq-trans                          owl:sameAs closure
+
+Left out to keep the closure small and useful: the axiomatic triples,
+rdfs4 / rdfs8 style "everything is a Resource" rules, ranges that are
+datatypes, and sameAs replacement (eq-rep-s/p/o): copying every edge of a
+resource onto its Wikidata aliases would count each product, manufacturer and
+architecture once per name in the default graph. Queries that start from an
+alias follow owl:sameAs to our IRI instead.
+"""
+from rdflib import Graph, Literal, RDF, RDFS, URIRef
+from rdflib.namespace import OWL, XSD
+
+# Upper bound on rounds; the rule set reaches its fixpoint long before for this data
+MAX_ROUNDS = 32
+
+_DATATYPE_NAMESPACES = (str(XSD), str(RDFS.Literal))
+
+
+def _is_class_range(c):
+    """rdfs3 only applies to class ranges, not datatypes such as xsd:integer or rdfs:Literal."""
+    return isinstance(c, URIRef) and not str(c).startswith(_DATATYPE_NAMESPACES)
+
+
+class _Index:
+    """The closure so far, indexed by subject, predicate and object for the joins."""
+
+    def __init__(self):
+        self.triples = set()
+        self.by_s, self.by_p, self.by_o = {}, {}, {}
+
+    def add(self, t):
+        if t in self.triples:
+            return False
+        self.triples.add(t)
+        self.by_s.setdefault(t[0], set()).add(t)
+        self.by_p.setdefault(t[1], set()).add(t)
+        self.by_o.setdefault(t[2], set()).add(t)
+        return True
+
+    def grouped(self, p, keep=None):
+        """{s: {o, ...}} of the p triples (whose object passes keep)."""
+        groups = {}
+        for s, _, o in self.by_p.get(p, ()):
+            if keep is None or keep(o):
+                groups.setdefault(s, set()).add(o)
+        return groups
+
+    def with_subject(self, s, p):
+        return {t for t in self.by_s.get(s, ()) if t[1] == p}
+
+    def with_object(self, o, p):
+        return {t for t in self.by_o.get(o, ()) if t[1] == p}
+
+
+def _derive(delta, full):
+    """Consequences of the rules with at least one premise in delta."""
+    out = set()
+    domains = full.grouped(RDFS.domain)
+    ranges = full.grouped(RDFS.range, keep=_is_class_range)
+    supers_p = full.grouped(RDFS.subPropertyOf)
+    supers_c = full.grouped(RDFS.subClassOf)
+    same = full.grouped(OWL.sameAs)
+
+    for s, p, o in delta:
+        # an instance triple from delta with the schema of the closure
+        for c in domains.get(p, ()):
+            out.add((s, RDF.type, c))
+        if not isinstance(o, Literal):
+            for c in ranges.get(p, ()):
+                out.add((o, RDF.type, c))
+        for q in supers_p.get(p, ()):
+            out.add((s, q, o))
+        if p == RDF.type:
+            for d in supers_c.get(o, ()):
+                out.add((s, RDF.type, d))
+
+        # a schema or sameAs triple from delta with the instances of the closure
+        if p == RDFS.domain:
+            out.update((x, RDF.type, o) for x, _, _ in full.by_p.get(s, ()))
+        elif p == RDFS.range and _is_class_range(o):
+            out.update((y, RDF.type, o) for _, _, y in full.by_p.get(s, ()) if not isinstance(y, Literal))
+        elif p == RDFS.subPropertyOf:
+            out.update((x, o, y) for x, _, y in full.by_p.get(s, ()))
+            out.update((s, p, r) for _, _, r in full.with_subject(o, p))
+            out.update((z, p, o) for z, _, _ in full.with_object(s, p))
+        elif p == RDFS.subClassOf:
+            out.update((x, RDF.type, o) for x, _, _ in full.with_object(s, RDF.type))
+            out.update((s, p, e) for _, _, e in full.with_subject(o, p))
+            out.update((z, p, o) for z, _, _ in full.with_object(s, p))
+        elif p == OWL.sameAs:
+            out.add((o, p, s))
+            out.update((s, p, c) for c in same.get(o, ()))
+            out.update((x, p, o) for x, _, _ in full.with_object(s, p))
+    return out
+
+
+def materialize(g, max_rounds=MAX_ROUNDS):
+    """
+    Returns a new Graph with the triples the rules add to g (without g's own
+    triples) and the number of rounds it took to reach the fixpoint.
+    """
+    full = _Index()
+    for t in g:
+        full.add(t)
+    delta = set(full.triples)
+    inferred = set()
+    rounds = 0
+    while delta and rounds < max_rounds:
+        rounds += 1
+        # reflexive sameAs adds nothing but noise
+        new = {t for t in _derive(delta, full) if t[1] != OWL.sameAs or t[0] != t[2]}
+        delta = {t for t in new if full.add(t)}
+        inferred |= delta
+
+    result = Graph()
+    for prefix, ns in g.namespaces():
+        result.bind(prefix, ns)
+    for t in inferred:
+        result.add(t)
+    return result, rounds
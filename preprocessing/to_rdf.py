@@ -1,8 +1,17 @@
+import argparse
+import os
+import time
 import pandas as pd
-from rdflib import Graph, Literal, RDF, Namespace, URIRef, RDFS
+from rdflib import Dataset, Graph, Literal, RDF, Namespace, URIRef, RDFS
 from rdflib.namespace import XSD, OWL
-from config import PROCESSED_CSV_PATH, OUTPUT_RDF_PATH
-from linkset import BRAND_LINKS, ARCH_LINKS
+from config import PROCESSED_CSV_PATH, OUTPUT_RDF_PATH, INFERRED_RDF_PATH, RELEASES_DIR
+from reasoner import materialize
+try:
+    # written by linkset_builder.py from a local Wikidata extract
+    from linkset_generated import BRAND_LINKS, ARCH_LINKS, CODENAME_LINKS
+except ImportError:
+    from Linkset import BRAND_LINKS, ARCH_LINKS
+    CODENAME_LINKS = {}
 
 # 1. Namespace definitions
 EX = Namespace("http://example.org/gpu/")
@@ -26,6 +35,11 @@ RDF_PROPERTIES = {
         XSD.integer,
         "The total amount of dedicated video memory available on the graphics card, measured in kilobytes."
     ),
+    EX.gpuName: (
+        "GPU Name",
+        XSD.string,
+        "The name of the graphics processor chip the card is built on (e.g., GK104, Navi 21)."
+    ),
     EX.gpuCodename: (
         "GPU Codename",
         XSD.string,
@@ -56,6 +70,11 @@ RDF_PROPERTIES = {
         XSD.integer,
         "The width of the memory interface between the GPU and its video memory, measured in bits."
     ),
+    EX.bandwidthMBs: (
+        "Memory Bandwidth (MB/s)",
+        XSD.float,
+        "The theoretical peak transfer rate between the GPU and its video memory, measured in megabytes per second."
+    ),
     EX.fp32GFlops: (
         "FP32 Performance (GFlops)",
         XSD.float,
@@ -85,7 +104,7 @@ RDF_PROPERTIES = {
 
 
 
-def create_rdf():
+def create_rdf(infer=True, release=None):
     try:
         df = pd.read_csv(PROCESSED_CSV_PATH)
     except FileNotFoundError:
@@ -159,8 +178,13 @@ def create_rdf():
         g.add((gpu_uri, RDF.type, SCHEMA.Product))
         g.add((gpu_uri, SCHEMA.name, Literal(row['product_name'], lang="en")))
 
+        if pd.notna(row['gpu_name']):
+            g.add((gpu_uri, EX.gpuName, Literal(row['gpu_name'], lang="en")))
+
         if pd.notna(row['gpu_codename']):
             g.add((gpu_uri, EX.gpuCodename, Literal(row['gpu_codename'], lang="en")))
+            if CODENAME_LINKS.get(row['gpu_codename']):
+                g.add((gpu_uri, RDFS.seeAlso, URIRef(CODENAME_LINKS[row['gpu_codename']])))
 
         if pd.notna(row['mem_type']):
             g.add((gpu_uri, EX.memoryType, Literal(row['mem_type'], lang="en")))
@@ -174,6 +198,9 @@ def create_rdf():
         if pd.notna(row['mem_bus_iri']):
             g.add((gpu_uri, EX.memBus, EX[row['mem_bus_iri']]))
 
+        if pd.notna(row['bandwidth_mbs']):
+            g.add((gpu_uri, EX.bandwidthMBs, Literal(float(row['bandwidth_mbs']), datatype=XSD.float)))
+
         if pd.notna(row['fp32_gflops']):
             g.add((gpu_uri, EX.fp32GFlops, Literal(float(row['fp32_gflops']), datatype=XSD.float)))
 
@@ -228,6 +255,41 @@ def create_rdf():
     g.serialize(destination=OUTPUT_RDF_PATH, format="turtle")
     print(f"Saved to: {OUTPUT_RDF_PATH}")
 
+    # Reasoning stage, the inferred triples go to their own file. The app loads that file
+    # whenever it exists, so it is always regenerated with the data or removed.
+    inferred = Graph()
+    if infer:
+        start = time.perf_counter()
+        inferred, rounds = materialize(g)
+        inferred.serialize(destination=INFERRED_RDF_PATH, format="turtle")
+        print(f"Inferred {len(inferred)} triples in {rounds} rounds ({time.perf_counter() - start:.2f} s)")
+        print(f"Saved to: {INFERRED_RDF_PATH}")
+    elif os.path.exists(INFERRED_RDF_PATH):
+        os.remove(INFERRED_RDF_PATH)
+        print(f"Removed the inferences of the previous run: {INFERRED_RDF_PATH}")
+
+    # Optional release: everything the app loads, as the named graph ex:release/<name>
+    if release:
+        publish_release(g, inferred, release)
+
+
+def publish_release(g, inferred, release):
+    ds = Dataset()
+    for prefix, ns in g.namespaces():
+        ds.bind(prefix, ns)
+    release_graph = ds.graph(EX[f"release/{release}"])
+    release_graph += g
+    release_graph += inferred
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    path = os.path.join(RELEASES_DIR, f"{release}.trig")
+    ds.serialize(destination=path, format="trig")
+    print(f"Published release {release} ({len(release_graph)} triples) to: {path}")
+
 if __name__ == "__main__":
-    create_rdf()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--infer", action=argparse.BooleanOptionalAction, default=True,
+                        help="materialize RDFS / owl:sameAs inferences (default); --no-infer removes them")
+    parser.add_argument("--release", help="also publish the data as release NAME (a named graph in data/releases)")
+    args = parser.parse_args()
+    create_rdf(infer=args.infer, release=args.release)
     print("\nto rdf - all done\n")
\ No newline at end of file
@@ -0,0 +1,54 @@
+import pandas as pd
+import streamlit as st
+from src.memory_report import cache_footprint, format_bytes, graph_footprint
+
+
+def show_admin(g, resources):
+    """Memory diagnostics: resources is {cache name: cached object}, in load order."""
+    st.subheader("Memory")
+    st.caption("Estimated from the sizes of the reachable Python objects, each object counted once; "
+               "the same report is available offline with `python -m src.memory_report`.")
+    if not st.button("Measure", type="primary"):
+        return
+
+    with st.spinner("Walking the graph and the caches..."):
+        report = graph_footprint(g)
+        report.caches = cache_footprint(resources)
+
+    col_triples, col_terms, col_index, col_rss = st.columns(4)
+    col_triples.metric("Triples", f"{report.triples:,}")
+    col_terms.metric("Terms", format_bytes(report.term_bytes))
+    col_index.metric("Indexes", format_bytes(report.index_bytes))
+    col_rss.metric("Peak RSS", format_bytes(report.max_rss_bytes))
+
+    st.write("### Per predicate")
+    st.dataframe(pd.DataFrame([{
+        "Predicate": p.predicate,
+        "Triples": p.triples,
+        "Distinct objects": p.distinct_objects,
+        "Term KB": p.term_bytes / 1024,
+        "Index KB": p.index_bytes / 1024,
+        "Total KB": p.total_bytes / 1024,
+    } for p in report.predicates]), hide_index=True, width="stretch",
+        column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ("Term KB", "Index KB", "Total KB")})
+
+    st.write("### Terms")
+    st.caption("Equal terms parsed from different triples are separate objects; "
+               "the last column is what sharing one object per value would save.")
+    st.dataframe(pd.DataFrame([{
+        "Term type": t.kind,
+        "Occurrences": t.occurrences,
+        "Distinct values": t.values,
+        "Objects": t.objects,
+        "Size": format_bytes(t.bytes),
+        "Interning saves": format_bytes(t.duplicate_bytes),
+    } for t in report.terms]), hide_index=True, width="stretch")
+
+    col_index, col_caches = st.columns(2)
+    col_index.write("### Index structures")
+    col_index.table({"Structure": list(report.index), "Size": [format_bytes(b) for b in report.index.values()]})
+    col_caches.write("### Caches")
+    col_caches.caption("Each cache without what an earlier one already holds (the graph is counted once).")
+    col_caches.table({"Cache": [name for name, _ in report.caches],
+                      "Size": [format_bytes(b) for _, b in report.caches]})
+    st.caption(f"Measured in {report.build_s:.2f} s.")
@@ -0,0 +1,126 @@
+import time
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import altair as alt
+import streamlit as st
+from src.product_table import build_product_table
+
+KB_PER_GB = 1024 ** 2
+
+# Trend -> (aggregate table, value column, axis title)
+TRENDS = {
+    "Median FP32 performance per year": ("by_year_brand", "gflops", "Median GFLOPS"),
+    "Performance per watt per year": ("by_year_brand", "gflops_per_watt", "Median GFLOPS / W"),
+    "Price per GFLOP per year": ("by_year_brand", "dollars_per_gflop", "Median $ / GFLOP"),
+    "VRAM by architecture": ("by_architecture", "vram_gb", "Median VRAM (GB)"),
+}
+
+
+@dataclass
+class Analytics:
+    """Aggregates of the product table behind the analytics charts (once per graph version)."""
+    version: str = None
+    # name -> aggregated DataFrame
+    tables: dict = field(default_factory=dict)
+    build_s: float = 0.0
+
+
+def product_frame(table):
+    """
+    The numeric product columns the trends use, plus the derived ratios,
+    as one DataFrame. Ratios are NaN where an input is missing or zero.
+    """
+    gflops = table.columns["fp32GFlops"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dollars_per_gflop = table.columns["price"] / np.where(gflops > 0, gflops, np.nan)
+    return pd.DataFrame({
+        "year": pd.array(table.columns["releaseYear"], dtype="Int64"),
+        "brand": table.columns["manufacturer"],
+        "architecture": table.columns["hasArchitecture"],
+        "gflops": gflops,
+        "gflops_per_watt": table.columns["gflopsPerWatt"],
+        "dollars_per_gflop": dollars_per_gflop,
+        "vram_gb": table.columns["memorySizeKB"] / KB_PER_GB,
+    })
+
+
+def build_analytics(table):
+    """Vectorized group-bys over the product table."""
+    start = time.perf_counter()
+    frame = product_frame(table)
+    metrics = ["gflops", "gflops_per_watt", "dollars_per_gflop"]
+
+    by_year_brand = (frame.dropna(subset=["year"])
+                     .groupby(["year", "brand"], observed=True)[metrics]
+                     .agg(["median", "count"]))
+    by_year_brand.columns = [f"{metric}_{stat}" if stat == "count" else metric
+                             for metric, stat in by_year_brand.columns]
+
+    by_architecture = (frame.dropna(subset=["architecture", "vram_gb"])
+                       .groupby("architecture")
+                       .agg(vram_gb=("vram_gb", "median"),
+                            vram_gb_count=("vram_gb", "count"),
+                            first_year=("year", "min"),
+                            brand=("brand", lambda s: s.mode().iat[0])))
+
+    return Analytics(
+        version=table.version,
+        tables={
+            "by_year_brand": by_year_brand.reset_index(),
+            "by_architecture": by_architecture.reset_index().sort_values(["first_year", "architecture"]),
+        },
+        build_s=time.perf_counter() - start,
+    )
+
+
+def _trend_chart(data, value, title):
+    """Line per brand over the release years."""
+    return alt.Chart(data).mark_line(point=True).encode(
+        x=alt.X("year:O", title="Release year"),
+        y=alt.Y(f"{value}:Q", title=title),
+        color=alt.Color("brand:N", title="Brand"),
+        tooltip=["year", "brand", alt.Tooltip(f"{value}:Q", format=",.2f"), f"{value}_count"],
+    )
+
+
+def _architecture_chart(data, value, title):
+    """Bar per architecture, in order of its first release."""
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X("architecture:N", sort=None, title="Architecture"),
+        y=alt.Y(f"{value}:Q", title=title),
+        color=alt.Color("brand:N", title="Brand"),
+        tooltip=["architecture", "brand", "first_year", alt.Tooltip(f"{value}:Q", format=",.2f"), f"{value}_count"],
+    )
+
+
+def show_analytics(g, products=None, analytics=None):
+    st.subheader("Analytics")
+
+    if products is None:
+        products = build_product_table(g)
+    if analytics is None:
+        analytics = build_analytics(products)
+
+    trend = st.selectbox("Trend:", list(TRENDS))
+    name, value, title = TRENDS[trend]
+    data = analytics.tables[name]
+
+    brands = sorted(data["brand"].dropna().unique())
+    default = [b for b in ("NVIDIA", "AMD", "Intel") if b in brands]
+    selected = st.multiselect("Brands:", brands, default=default)
+    log_scale = st.checkbox("Logarithmic scale", value=name == "by_year_brand")
+
+    data = data[data["brand"].isin(selected) & data[value].notna()]
+    if data.empty:
+        st.info("No data for this selection.")
+        return
+
+    chart = _trend_chart(data, value, title) if name == "by_year_brand" else _architecture_chart(data, value, title)
+    if log_scale:
+        chart = chart.encode(y=alt.Y(f"{value}:Q", title=title, scale=alt.Scale(type="log")))
+    st.altair_chart(chart.properties(height=450), use_container_width=True)
+
+    with st.expander("Data"):
+        st.dataframe(data, use_container_width=True, hide_index=True)
+    st.caption(f"Aggregated over {len(products):,} products in {analytics.build_s * 1000:.1f} ms, cached per graph version.")
@@ -0,0 +1,257 @@
+"""
+Runs a suite of SPARQL queries against the graph in a process pool and
+compares the answers and latencies with a previous run.
+
+    python -m src.batch_runner [QUERY_FILE_OR_DIR ...] [--builtin] [--workers N]
+                               [--baseline results.json] [--output results.json]
+
+Queries come from .rq / .sparql files (directories are searched recursively)
+and, with --builtin or when no path is given, from the console presets and
+the query shapes the encyclopedia generates. The graph, with the published
+releases as named graphs (src.releases), is parsed once; the workers are
+forked from the loaded process and share it copy-on-write.
+Exits with status 1 when the baseline comparison finds a regression.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import re
+import signal
+import statistics
+import time
+from rdflib import BNode
+from src.queries import CONSOLE_TEMPLATES, build_wiki_query
+from src.releases import InternedGraph, build_release_dataset, release_paths
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Same files as the app loads (app.TTL_PATH, app.INFERRED_TTL_PATH); missing ones are skipped
+DATA_PATHS = (
+    os.path.join(BASE_DIR, "data", "gpu_data.ttl"),
+    os.path.join(BASE_DIR, "data", "gpu_inferred.ttl"),
+)
+QUERY_SUFFIXES = (".rq", ".sparql")
+
+DEFAULT_TIMEOUT_S = 60.0
+# A query is a latency regression when it is this much slower than the baseline ...
+LATENCY_TOLERANCE = 1.5
+# ... and slower by at least this many seconds (ignores noise on fast queries)
+LATENCY_MIN_DELTA_S = 0.05
+
+# Encyclopedia filters exercised by the built-in suite
+WIKI_CASES = [
+    ("All", None),
+    ("Brand", "NVIDIA"),
+    ("Architecture", "Ada Lovelace"),
+    ("Release Year", "2020"),
+    ("Memory Size", "mem_size_8_GB"),
+    ("Memory Type", "GDDR6"),
+    ("Memory Bus", "memBus_256"),
+]
+WIKI_RANKINGS = ["schema:name", "ex:tdpWatts", "ex:fp32GFlops", "schema:price"]
+
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+# The dataset the workers query (current data plus releases); set in the parent before forking
+_GRAPH = None
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+def load_graph(paths=DATA_PATHS):
+    g = InternedGraph()
+    for path in paths:
+        if os.path.exists(path):
+            g.parse(path, format="turtle")
+    return g
+
+
+def load_dataset(paths=DATA_PATHS, releases=None):
+    """The graph of paths as the default graph, with the published releases as named graphs."""
+    return build_release_dataset(load_graph(paths), release_paths() if releases is None else releases)
+
+
+def builtin_queries():
+    """{id: query} for the console presets and the encyclopedia query shapes."""
+    queries = {}
+    for name, query in CONSOLE_TEMPLATES.items():
+        # SERVICE presets need the stand-in endpoint (src.sparql_endpoint) running
+        if query.lstrip().startswith("#") or "SERVICE" in query:
+            continue
+        queries[f"console/{name}"] = query
+    for ranking in WIKI_RANKINGS:
+        for filter_type, filter_value in WIKI_CASES:
+            queries[f"wiki/{filter_type}={filter_value}/{ranking}"] = build_wiki_query(filter_type, filter_value, ranking)
+    return queries
+
+
+def file_queries(paths):
+    """{id: query} from query files; the id is the path relative to the given directory."""
+    queries = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(QUERY_SUFFIXES):
+                        full = os.path.join(root, name)
+                        with open(full, encoding="utf-8") as f:
+                            queries[os.path.relpath(full, path)] = f.read()
+        else:
+            with open(path, encoding="utf-8") as f:
+                queries[os.path.basename(path)] = f.read()
+    return queries
+
+
+def _term_key(term):
+    # blank node labels differ between parses and runs
+    return "_:b" if isinstance(term, BNode) else term.n3()
+
+
+def result_digest(result, ordered=False):
+    """
+    (sha1 of the canonical answer, number of rows). Rows keep their order
+    for ordered queries and are compared as a multiset otherwise.
+    """
+    if result.type == "ASK":
+        lines = [str(bool(result.askAnswer))]
+    elif result.type in ("CONSTRUCT", "DESCRIBE"):
+        lines = sorted(" ".join(_term_key(t) for t in triple) for triple in result.graph)
+    else:
+        lines = ["\t".join("" if v is None else _term_key(v) for v in row) for row in result]
+        if not ordered:
+            lines.sort()
+        lines.insert(0, "\t".join(str(v) for v in result.vars))
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest(), len(lines) - (result.type == "SELECT")
+
+
+def _on_alarm(signum, frame):
+    raise QueryTimeout()
+
+
+def run_one(task):
+    """Worker: (id, query, repeat, timeout_s) -> result record."""
+    query_id, query, repeat, timeout_s = task
+    record = {"id": query_id, "latency_s": None, "hash": None, "rows": None, "error": None}
+    timings = []
+    ordered = bool(_ORDER_BY.search(query))
+    signal.signal(signal.SIGALRM, _on_alarm)
+    try:
+        for _ in range(repeat):
+            signal.setitimer(signal.ITIMER_REAL, timeout_s)
+            start = time.perf_counter()
+            digest, rows = result_digest(_GRAPH.query(query), ordered)
+            timings.append(time.perf_counter() - start)
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        record.update(latency_s=statistics.median(timings), hash=digest, rows=rows)
+    except QueryTimeout:
+        record["error"] = f"timeout after {timeout_s:g} s"
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return record
+
+
+def _init_worker(paths):
+    """Worker setup when fork is not available: every worker parses the graph itself."""
+    global _GRAPH
+    _GRAPH = load_dataset(paths)
+
+
+def run_suite(queries, workers=None, repeat=1, timeout_s=DEFAULT_TIMEOUT_S, paths=DATA_PATHS):
+    """Runs all queries, returns {id: record} in the order of queries."""
+    global _GRAPH
+    tasks = [(query_id, query, repeat, timeout_s) for query_id, query in queries.items()]
+    if "fork" in mp.get_all_start_methods():
+        if _GRAPH is None:
+            _GRAPH = load_dataset(paths)
+        pool = mp.get_context("fork").Pool(workers)
+    else:
+        pool = mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(paths,))
+    with pool:
+        records = pool.map(run_one, tasks, chunksize=1)
+    return {record["id"]: record for record in records}
+
+
+def compare(results, baseline, tolerance=LATENCY_TOLERANCE, min_delta_s=LATENCY_MIN_DELTA_S):
+    """Lists of (id, message) for correctness and latency regressions, and other notes."""
+    wrong, slow, notes = [], [], []
+    for query_id, record in results.items():
+        before = baseline.get(query_id)
+        if before is None:
+            notes.append((query_id, "new query"))
+            continue
+        if record["error"] and not before["error"]:
+            wrong.append((query_id, f"now fails: {record['error']}"))
+        elif record["hash"] != before["hash"] and not record["error"]:
+            wrong.append((query_id, f"different answer ({before['rows']} -> {record['rows']} rows)"))
+        if record["latency_s"] is not None and before["latency_s"] is not None:
+            delta = record["latency_s"] - before["latency_s"]
+            if record["latency_s"] > before["latency_s"] * tolerance and delta >= min_delta_s:
+                slow.append((query_id, f"{before['latency_s']:.3f}s -> {record['latency_s']:.3f}s"))
+            elif before["latency_s"] > record["latency_s"] * tolerance and -delta >= min_delta_s:
+                notes.append((query_id, f"faster: {before['latency_s']:.3f}s -> {record['latency_s']:.3f}s"))
+    for query_id in baseline.keys() - results.keys():
+        notes.append((query_id, "missing from this run"))
+    return wrong, slow, notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="query files or directories (.rq, .sparql)")
+    parser.add_argument("--builtin", action="store_true", help="include the console presets and encyclopedia queries")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per query, the median latency is recorded")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="seconds per query run")
+    parser.add_argument("--baseline", help="results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=LATENCY_TOLERANCE,
+                        help="slowdown factor that counts as a latency regression")
+    parser.add_argument("--output", help="write this run's results (JSON) here")
+    parser.add_argument("--data", nargs="+", default=list(DATA_PATHS), help="Turtle files to load")
+    args = parser.parse_args()
+
+    queries = file_queries(args.paths)
+    if args.builtin or not args.paths:
+        queries.update(builtin_queries())
+
+    start = time.perf_counter()
+    global _GRAPH
+    _GRAPH = load_dataset(args.data)
+    load_s = time.perf_counter() - start
+    print(f"loaded {len(_GRAPH.store.base):,} triples and {len(_GRAPH.store.releases)} releases in {load_s:.2f} s, "
+          f"running {len(queries)} queries on {args.workers} workers")
+
+    start = time.perf_counter()
+    results = run_suite(queries, args.workers, args.repeat, args.timeout, args.data)
+    wall_s = time.perf_counter() - start
+    for record in results.values():
+        status = record["error"] or f"{record['rows']:6} rows {record['hash'][:12]}"
+        latency = f"{record['latency_s']:8.3f}s" if record["latency_s"] is not None else " " * 9
+        print(f"{latency}  {record['id']:60}  {status}")
+    total = sum(r["latency_s"] or 0 for r in results.values())
+    print(f"wall time {wall_s:.2f} s for {total:.2f} s of query time")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"triples": len(_GRAPH.store.base), "data": args.data, "results": results}, f, indent=1)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        wrong, slow, notes = compare(results, baseline, args.tolerance)
+        for title, items in (("correctness regressions", wrong), ("latency regressions", slow), ("notes", notes)):
+            if items:
+                print(f"\n{title} ({len(items)}):")
+                for query_id, message in items:
+                    print(f"  {query_id}: {message}")
+        if wrong or slow:
+            raise SystemExit(1)
+        print("\nno regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
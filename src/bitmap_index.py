@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+import numpy as np
+from src.product_table import EX, SCHEMA, column_name
+
+WORD_BITS = 64
+
+# Encyclopedia filter -> predicate linking a product to the facet value
+FACET_PREDICATES = {
+    "Brand": SCHEMA.manufacturer,
+    "Architecture": EX.hasArchitecture,
+    "Release Year": EX.releaseYear,
+    "Memory Size": EX.memorySize,
+    "Memory Type": EX.memoryType,
+    "Memory Bus": EX.memBus,
+}
+
+
+def pack(mask):
+    """Boolean row mask -> bitset of uint64 words (bit i of the set is row i)."""
+    padded = np.zeros(-(-len(mask) // WORD_BITS) * WORD_BITS, dtype=bool)
+    padded[:len(mask)] = mask
+    return np.packbits(padded, bitorder="little").view(np.uint64)
+
+
+def unpack(bits, n_rows):
+    """Bitset -> boolean row mask of length n_rows."""
+    return np.unpackbits(bits.view(np.uint8), count=n_rows, bitorder="little").astype(bool)
+
+
+def popcount(bits):
+    return int(np.bitwise_count(bits).sum())
+
+
+@dataclass
+class BitmapIndex:
+    """
+    One bitset per facet value over the rows of the product table. Selections
+    are combined with word-wise OR (within a facet) and AND (across facets),
+    so filtering and counting cost n_rows / 64 operations per bitset.
+    """
+    version: str = None
+    n_rows: int = 0
+    all_rows: np.ndarray = None
+    # facet -> value -> bitset
+    bitsets: dict = field(default_factory=dict)
+
+    def facet_bits(self, facet, values):
+        """Rows having any of the values (None when nothing is selected = no restriction)."""
+        if not values:
+            return None
+        bits = np.zeros_like(self.all_rows)
+        for value in values:
+            bits |= self.bitsets[facet].get(value, 0)
+        return bits
+
+    def combine(self, selections, extra=(), exclude=None):
+        """AND of the selected facets (except `exclude`) and extra bitsets, e.g. ranges."""
+        result = self.all_rows.copy()
+        for facet, values in selections.items():
+            if facet == exclude:
+                continue
+            bits = self.facet_bits(facet, values)
+            if bits is not None:
+                result &= bits
+        for bits in extra:
+            result &= bits
+        return result
+
+    def counts(self, facet, base):
+        """Number of rows of `base` for every value of the facet."""
+        return {value: popcount(base & bits) for value, bits in self.bitsets[facet].items()}
+
+    def live_counts(self, selections, extra=()):
+        """
+        Per facet, the counts its values would have given all the other
+        selections, as shown next to the options while the user picks them.
+        """
+        return {facet: self.counts(facet, self.combine(selections, extra, exclude=facet))
+                for facet in self.bitsets}
+
+
+def range_bits(table, column, low, high):
+    """Bitset of the rows whose numeric column lies within [low, high]."""
+    values = table.columns[column]
+    return pack((values >= low) & (values <= high))
+
+
+def build_bitmap_index(table, facets=FACET_PREDICATES):
+    """Bitsets for every value of every encyclopedia facet (once per graph version)."""
+    index = BitmapIndex(version=table.version, n_rows=len(table), all_rows=pack(np.ones(len(table), dtype=bool)))
+    for facet, predicate in facets.items():
+        column = table.columns[column_name(predicate)]
+        labels = np.array([None if v != v else (str(int(v)) if table.is_numeric(column_name(predicate)) else v)
+                           for v in column], dtype=object)
+        index.bitsets[facet] = {value: pack(labels == value) for value in sorted(set(labels) - {None})}
+    return index
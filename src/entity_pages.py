@@ -0,0 +1,142 @@
+from dataclasses import dataclass, field
+import streamlit as st
+from rdflib import Literal, Namespace, RDF, RDFS
+from rdflib.namespace import OWL
+from src.product_table import facet_label
+
+EX = Namespace("http://example.org/gpu/")
+SCHEMA = Namespace("https://schema.org/")
+
+# Query parameter holding the card of the detail page, e.g. ?gpu=AMD_c75738fe84
+QUERY_PARAM = "gpu"
+
+
+def entity_id(iri):
+    """Stable URL id of a product: its local name."""
+    return str(iri).split("/")[-1].split("#")[-1]
+
+
+def entity_url(iri):
+    return f"?{QUERY_PARAM}={entity_id(iri)}"
+
+
+@dataclass
+class EntityRecord:
+    """Everything the detail page of one card shows."""
+    iri: str = None
+    name: str = None
+    # [(property label, value)], declared properties first, by label
+    properties: list = field(default_factory=list)
+    # (label, iri, [sameAs iri, ...]) or None
+    brand: tuple = None
+    architecture: tuple = None
+    # [(id, name)] of the other cards built on the same GPU chip
+    siblings: list = field(default_factory=list)
+
+
+@dataclass
+class EntityStore:
+    """Detail page records of all products keyed by entity_id."""
+    version: str = None
+    records: dict = field(default_factory=dict)
+    # ids of all cards sorted by name, and the position of each id in that list
+    ids: list = field(default_factory=list)
+    positions: dict = field(default_factory=dict)
+
+    def get(self, gpu_id):
+        return self.records.get(gpu_id)
+
+    def options(self):
+        """Ids of all cards, sorted by name (computed once per graph version)."""
+        return self.ids
+
+    def position(self, gpu_id):
+        return self.positions.get(gpu_id)
+
+
+def _linked(g, product, predicate):
+    """The linked node, preferring our own IRI over aliases inferred through owl:sameAs."""
+    nodes = sorted(g.objects(product, predicate), key=lambda n: (not str(n).startswith(str(EX)), str(n)))
+    if not nodes:
+        return None
+    node = nodes[0]
+    return facet_label(g, node), str(node), sorted(str(o) for o in g.objects(node, OWL.sameAs))
+
+
+def build_entity_store(g, version=None):
+    """One record per schema:Product, assembled from subject lookups once per graph version."""
+    declared = {p: str(label) for p, label in g.subject_objects(RDFS.label)}
+    labels = {}
+
+    def label(term):
+        if term not in labels:
+            labels[term] = facet_label(g, term)
+        return labels[term]
+
+    store = EntityStore(version=version)
+    chips = {}
+    for product in g.subjects(RDF.type, SCHEMA.Product):
+        record = EntityRecord(iri=str(product), name=str(g.value(product, SCHEMA.name)))
+        properties = []
+        for p, o in g.predicate_objects(product):
+            if p in (RDF.type, SCHEMA.manufacturer, EX.hasArchitecture):
+                continue
+            value = str(o) if isinstance(o, Literal) else label(o)
+            properties.append((p not in declared, declared.get(p) or label(p), value))
+        record.properties = [(name, value) for _, name, value in sorted(properties)]
+        record.brand = _linked(g, product, SCHEMA.manufacturer)
+        record.architecture = _linked(g, product, EX.hasArchitecture)
+        chip = g.value(product, EX.gpuName)
+        if chip is not None:
+            chips.setdefault(str(chip), []).append(entity_id(product))
+        store.records[entity_id(product)] = record
+
+    for chip, ids in chips.items():
+        for gpu_id in ids:
+            store.records[gpu_id].siblings = sorted(
+                ((other, store.records[other].name) for other in ids if other != gpu_id), key=lambda s: s[1])
+    store.ids = sorted(store.records, key=lambda i: (store.records[i].name or "", i))
+    store.positions = {gpu_id: i for i, gpu_id in enumerate(store.ids)}
+    return store
+
+
+def _show_linked(column, title, linked):
+    column.write(f"**{title}**")
+    if linked is None:
+        column.write("Unknown")
+        return
+    label, iri, same_as = linked
+    column.write(f"[{label}]({iri})")
+    for other in same_as:
+        column.caption(f"owl:sameAs [{other.split('/')[-1]}]({other})")
+
+
+def show_entity_page(store):
+    st.subheader("GPU Details")
+
+    current = st.query_params.get(QUERY_PARAM)
+    gpu_id = st.selectbox("Card:", store.options(), index=store.position(current), placeholder="Pick a card",
+                          format_func=lambda i: store.records[i].name)
+    if gpu_id is None:
+        if current is not None:
+            st.warning(f"Unknown card '{current}'.")
+        return
+    # keep the URL pointing at the page shown
+    if gpu_id != current:
+        st.query_params[QUERY_PARAM] = gpu_id
+
+    record = store.get(gpu_id)
+    st.write(f"## {record.name}")
+    st.caption(record.iri)
+
+    col_brand, col_arch = st.columns(2)
+    _show_linked(col_brand, "Brand", record.brand)
+    _show_linked(col_arch, "Architecture", record.architecture)
+
+    st.write("### Properties")
+    st.table({"Property": [label for label, _ in record.properties],
+              "Value": [value for _, value in record.properties]})
+
+    if record.siblings:
+        st.write(f"### Other cards on the same GPU ({len(record.siblings)})")
+        st.markdown("\n".join(f"- [{name}]({entity_url(other)})" for other, name in record.siblings))
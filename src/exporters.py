@@ -0,0 +1,310 @@
+import csv
+import io
+import json
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+from rdflib import BNode, Literal, URIRef, Variable
+from rdflib.plugins.serializers.nt import _nt_row, _quoteLiteral
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.algebra import traverse
+from rdflib.plugins.sparql.parserutils import CompValue
+from src.query_exec import run_query, DEFAULT_TIMEOUT_S
+
+# Upper bound for a single export. Streamlit reads the finished file into memory
+# to serve the download, so this also bounds what one download holds in RAM.
+EXPORT_MAX_ROWS = 1_000_000
+
+
+class ExportIncomplete(Exception):
+    """The export stopped before the end of the result (timeout or row cap)."""
+
+
+def _term_json(term):
+    """SPARQL 1.1 JSON results encoding of one RDF term."""
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    res = {"type": "literal", "value": str(term)}
+    if term.language:
+        res["xml:lang"] = term.language
+    elif term.datatype:
+        res["datatype"] = str(term.datatype)
+    return res
+
+
+class SparqlJsonWriter:
+    """application/sparql-results+json"""
+
+    def __init__(self, out, vars, query=None):
+        self.out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        self.vars = vars
+        self.first = True
+        self.out.write(json.dumps({"head": {"vars": vars}})[:-1] + ', "results": {"bindings": [\n')
+
+    def write(self, rows):
+        for row in rows:
+            binding = {k: _term_json(v) for k, v in zip(self.vars, row) if v is not None}
+            self.out.write(("" if self.first else ",\n") + json.dumps(binding))
+            self.first = False
+
+    def close(self):
+        self.out.write("\n]}}\n")
+        self.out.detach()
+
+
+class SparqlXmlWriter:
+    """application/sparql-results+xml"""
+
+    def __init__(self, out, vars, query=None):
+        self.out = io.TextIOWrapper(out, encoding="utf-8")
+        self.vars = vars
+        self.out.write('<?xml version="1.0"?>\n<sparql xmlns="http://www.w3.org/2005/sparql-results#">\n<head>\n')
+        for v in vars:
+            self.out.write(f"  <variable name={quoteattr(v)}/>\n")
+        self.out.write("</head>\n<results>\n")
+
+    def write(self, rows):
+        for row in rows:
+            self.out.write("  <result>\n")
+            for k, v in zip(self.vars, row):
+                if v is None:
+                    continue
+                if isinstance(v, URIRef):
+                    value = f"<uri>{escape(str(v))}</uri>"
+                elif isinstance(v, BNode):
+                    value = f"<bnode>{escape(str(v))}</bnode>"
+                elif v.language:
+                    value = f"<literal xml:lang={quoteattr(v.language)}>{escape(str(v))}</literal>"
+                elif v.datatype:
+                    value = f"<literal datatype={quoteattr(str(v.datatype))}>{escape(str(v))}</literal>"
+                else:
+                    value = f"<literal>{escape(str(v))}</literal>"
+                self.out.write(f"    <binding name={quoteattr(k)}>{value}</binding>\n")
+            self.out.write("  </result>\n")
+
+    def close(self):
+        self.out.write("</results>\n</sparql>\n")
+        self.out.detach()
+
+
+class CsvWriter:
+    """SPARQL 1.1 CSV results: plain lexical values."""
+    delimiter = ","
+
+    def __init__(self, out, vars, query=None):
+        self.out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        self.writer = csv.writer(self.out, delimiter=self.delimiter)
+        self.writer.writerow(vars)
+
+    def _cell(self, term):
+        return "" if term is None else str(term)
+
+    def write(self, rows):
+        self.writer.writerows([self._cell(v) for v in row] for row in rows)
+
+    def close(self):
+        self.out.detach()
+
+
+class TsvWriter:
+    """SPARQL 1.1 TSV results: terms in N-Triples syntax."""
+
+    def __init__(self, out, vars, query=None):
+        self.out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        self.out.write("\t".join("?" + v for v in vars) + "\n")
+
+    def _cell(self, term):
+        if term is None:
+            return ""
+        return _quoteLiteral(term) if isinstance(term, Literal) else term.n3()
+
+    def write(self, rows):
+        self.out.writelines("\t".join(self._cell(v) for v in row) + "\n" for row in rows)
+
+    def close(self):
+        self.out.detach()
+
+
+class NTriplesWriter:
+    """application/n-triples, for CONSTRUCT / DESCRIBE results."""
+
+    def __init__(self, out, vars, query=None):
+        self.out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+
+    def write(self, rows):
+        self.out.writelines(_nt_row(triple) for triple in rows)
+
+    def close(self):
+        self.out.detach()
+
+
+class ParquetWriter:
+    """Apache Parquet with one string column per variable, one row group per chunk."""
+
+    def __init__(self, out, vars, query=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.vars = vars
+        self.schema = pa.schema([(v, pa.string()) for v in vars])
+        self.writer = pq.ParquetWriter(out, self.schema)
+
+    def write(self, rows):
+        columns = [[None if v is None else str(v) for v in col] for col in zip(*rows)]
+        if columns:
+            self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _predicate_map(query):
+    """
+    Maps variables of a prepared query to the predicate that binds them as
+    an object (?s <p> ?var), plus the variables used as subjects.
+    """
+    predicates = {}
+    subjects = []
+
+    def visit(node):
+        if isinstance(node, CompValue) and node.name == "BGP":
+            for s, p, o in node.triples:
+                if isinstance(p, URIRef) and isinstance(o, Variable):
+                    predicates.setdefault(str(o), str(p))
+                if isinstance(s, Variable) and str(s) not in subjects:
+                    subjects.append(str(s))
+
+    if query is not None:
+        traverse(query.algebra, visit)
+    return predicates, subjects
+
+
+class JsonLdWriter:
+    """
+    application/ld+json. Rows are written as they come and the @context is
+    appended after the @graph, built from the predicates actually seen.
+    """
+
+    def __init__(self, out, vars, query=None):
+        self.out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        self.vars = vars
+        self.is_graph = query is not None and query.algebra.name != "SelectQuery"
+        self.predicates, subjects = _predicate_map(query)
+        self.id_var = next((v for v in subjects if v in vars), None)
+        self.context = {}
+        self.keys = {}
+        self.first = True
+        self.out.write('{\n"@graph": [\n')
+
+    def _value(self, term):
+        if isinstance(term, URIRef):
+            return {"@id": str(term)}
+        if isinstance(term, BNode):
+            return {"@id": term.n3()}
+        if term.language:
+            return {"@value": str(term), "@language": term.language}
+        if term.datatype:
+            return {"@value": str(term), "@type": str(term.datatype)}
+        return str(term)
+
+    def _key(self, predicate):
+        """Short context term for a predicate IRI (its local name when free)."""
+        if predicate not in self.keys:
+            local = predicate.rstrip("/#").replace("#", "/").split("/")[-1]
+            key = local if local and local not in self.context else predicate
+            if key != predicate:
+                self.context[key] = predicate
+            self.keys[predicate] = key
+        return self.keys[predicate]
+
+    def _node(self, row):
+        if self.is_graph:
+            s, p, o = row
+            return {"@id": self._value(s)["@id"], self._key(str(p)): self._value(o)}
+
+        node = {}
+        for k, v in zip(self.vars, row):
+            if v is None:
+                continue
+            if k == self.id_var and not isinstance(v, Literal):
+                node["@id"] = self._value(v)["@id"]
+                continue
+            if k in self.predicates:
+                self.context.setdefault(k, self.predicates[k])
+            node[k] = self._value(v)
+        return node
+
+    def write(self, rows):
+        for row in rows:
+            self.out.write(("" if self.first else ",\n") + json.dumps(self._node(row)))
+            self.first = False
+
+    def close(self):
+        self.out.write("\n],\n")
+        self.out.write('"@context": ' + json.dumps(self.context, indent=2) + "\n}\n")
+        self.out.detach()
+
+
+# label -> (file name, mime type, writer, only for graph results)
+EXPORT_FORMATS = {
+    "SPARQL JSON": ("results.srj", "application/sparql-results+json", SparqlJsonWriter, False),
+    "SPARQL XML": ("results.srx", "application/sparql-results+xml", SparqlXmlWriter, False),
+    "CSV": ("results.csv", "text/csv", CsvWriter, False),
+    "TSV": ("results.tsv", "text/tab-separated-values", TsvWriter, False),
+    "JSON-LD": ("results.jsonld", "application/ld+json", JsonLdWriter, False),
+    "N-Triples": ("results.nt", "application/n-triples", NTriplesWriter, True),
+    "Parquet": ("results.parquet", "application/vnd.apache.parquet", ParquetWriter, False),
+}
+
+
+def formats_for(kind):
+    """Export formats that make sense for a query form (SELECT, CONSTRUCT, ...)."""
+    is_graph = kind in ("CONSTRUCT", "DESCRIBE")
+    return [name for name, (_, _, _, graph_only) in EXPORT_FORMATS.items() if is_graph or not graph_only]
+
+
+def export_results(g, query, fmt, out, timeout_s=DEFAULT_TIMEOUT_S, max_rows=EXPORT_MAX_ROWS):
+    """
+    Runs the full query in the worker and writes each chunk of rows to the
+    binary file `out` as it arrives. Returns the QueryOutcome (without rows).
+    Raises ExportIncomplete rather than returning a partial file.
+    """
+    writer_cls = EXPORT_FORMATS[fmt][2]
+    writer = None
+    if isinstance(query, str):
+        query = prepareQuery(query, initNs=dict(g.namespaces()))
+
+    def on_rows(vars, rows):
+        nonlocal writer
+        if writer is None:
+            writer = writer_cls(out, vars, query)
+        writer.write(rows)
+
+    outcome = run_query(g, query, timeout_s=timeout_s, max_rows=max_rows, on_rows=on_rows)
+    if outcome.error:
+        raise Exception(outcome.error)
+    if outcome.timed_out:
+        raise ExportIncomplete(f"Export timed out after {timeout_s:g} s; the file would be incomplete.")
+    if outcome.truncated:
+        raise ExportIncomplete(f"The result has more than {max_rows:,} rows, the export limit.")
+    if writer is None:
+        writer = writer_cls(out, outcome.vars, query)
+    writer.close()
+    return outcome
+
+
+def export_bytes(g, query, fmt, timeout_s=DEFAULT_TIMEOUT_S):
+    """
+    The export as bytes, for st.download_button (which only accepts str,
+    bytes and text/binary buffers it can read whole). Rows are written to a
+    temporary file as they arrive and read back once the export is complete.
+    """
+    out = tempfile.TemporaryFile()
+    try:
+        export_results(g, query, fmt, out, timeout_s=timeout_s)
+        out.seek(0)
+        return out.read()
+    finally:
+        out.close()
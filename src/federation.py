@@ -0,0 +1,343 @@
+"""
+Federated SERVICE evaluation for console queries.
+
+rdflib evaluates `SERVICE <endpoint> { ... }` once per solution of the
+pattern before it: one HTTP request, on a new connection, per local
+binding. Importing this module registers an evaluator (CUSTOM_EVALS, like
+the profiler) that evaluates SERVICE as a bind-join instead:
+
+- the solutions of the left-hand side are read in windows, and the distinct
+  values of the join variables are sent BATCH_SIZE at a time as one VALUES
+  block,
+- the batches of a window are sent concurrently over a pooled keep-alive
+  session per endpoint,
+- the remote rows are cached per endpoint and join key in SQLite, so the
+  cache outlives the forked query workers of the console.
+
+Only the endpoints in SERVICE_ENDPOINTS are contacted.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from rdflib import BNode, Literal, URIRef, Variable
+from rdflib.plugins.sparql import CUSTOM_EVALS
+from rdflib.plugins.sparql.algebra import Project, Query, _addVars, _traverseAgg, translateAlgebra, \
+    translateGroupGraphPattern
+from rdflib.plugins.sparql.evalutils import _ebv
+from rdflib.plugins.sparql.evaluate import evalPart
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import SPARQLError
+from src.exporters import _term_json
+from src.query_log import LOG_DIR
+from src.sparql_endpoint import DEFAULT_URL
+
+# Endpoints SERVICE may contact (comma separated); anything else is refused
+SERVICE_ENDPOINTS = [u.strip() for u in os.environ.get("GPU_LD_SERVICE_ENDPOINTS", DEFAULT_URL).split(",") if u.strip()]
+
+# Join keys per VALUES block, and VALUES blocks in flight per SERVICE pattern
+BATCH_SIZE = int(os.environ.get("GPU_LD_SERVICE_BATCH", "100"))
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("GPU_LD_SERVICE_CONCURRENCY", "4"))
+REQUEST_TIMEOUT_S = 30.0
+
+CACHE_PATH = os.environ.get("GPU_LD_SERVICE_CACHE", os.path.join(LOG_DIR, "service_cache.sqlite"))
+CACHE_TTL_S = float(os.environ.get("GPU_LD_SERVICE_CACHE_TTL_S", "600"))
+
+_HEADERS = {"Accept": "application/sparql-results+json"}
+
+# translateGroupGraphPattern rewrites the parse tree it is given, so a pattern is translated once
+_translate_lock = threading.Lock()
+
+
+class ServiceCache:
+    """Remote rows per (endpoint, SERVICE pattern, join key) for ttl_s seconds. path None keeps them in memory."""
+
+    def __init__(self, path=CACHE_PATH, ttl_s=CACHE_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # a connection must not cross a fork, every query worker opens its own
+        if self._pid != os.getpid():
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path or ":memory:", timeout=10, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS rows (endpoint TEXT, pattern TEXT, key TEXT, "
+                               "rows TEXT, stored REAL, PRIMARY KEY (endpoint, pattern, key))")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, endpoint, pattern, keys):
+        """{key: rows} of the keys cached and not expired."""
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for key in keys:
+                row = conn.execute("SELECT rows FROM rows WHERE endpoint = ? AND pattern = ? AND key = ? "
+                                   "AND stored >= ?", (endpoint, pattern, key, time.time() - self.ttl_s)).fetchone()
+                if row is not None:
+                    found[key] = json.loads(row[0])
+        return found
+
+    def put_many(self, endpoint, pattern, rows_by_key):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)",
+                             [(endpoint, pattern, key, json.dumps(rows), now) for key, rows in rows_by_key.items()])
+            conn.commit()
+
+    def stats(self):
+        """[(endpoint, cached keys, expired keys)]"""
+        if self.path and not os.path.exists(self.path):
+            return []
+        with self._lock:
+            return self._connection().execute(
+                "SELECT endpoint, SUM(stored >= ?), SUM(stored < ?) FROM rows GROUP BY endpoint ORDER BY endpoint",
+                (time.time() - self.ttl_s,) * 2).fetchall()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM rows")
+            conn.commit()
+
+
+class ServiceClient:
+    """Pooled sessions, batching and cache for the SERVICE calls of one process."""
+
+    def __init__(self, endpoints=None, batch_size=BATCH_SIZE, max_concurrency=MAX_CONCURRENT_REQUESTS,
+                 cache=None, timeout_s=REQUEST_TIMEOUT_S):
+        self.endpoints = SERVICE_ENDPOINTS if endpoints is None else endpoints
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.timeout_s = timeout_s
+        self.requests = 0
+        self.cache_hits = 0
+        self._sessions = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session(self, endpoint):
+        with self._lock:
+            # pooled connections must not cross a fork either
+            if self._pid != os.getpid():
+                self._sessions, self._pid = {}, os.getpid()
+            if endpoint not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[endpoint] = session
+            return self._sessions[endpoint]
+
+    def select(self, endpoint, query):
+        """Bindings (SPARQL JSON) of a SELECT query on the endpoint."""
+        with self._lock:
+            self.requests += 1
+        response = self.session(endpoint).post(endpoint, data={"query": query}, headers=_HEADERS,
+                                               timeout=self.timeout_s)
+        response.raise_for_status()
+        return response.json()["results"]["bindings"]
+
+
+_client = None
+
+
+def client():
+    """The ServiceClient the evaluator uses, created on first use."""
+    global _client
+    if _client is None:
+        _client = ServiceClient(cache=ServiceCache())
+    return _client
+
+
+def use_client(c):
+    """Replaces the ServiceClient (benchmarks, tests); returns the previous one."""
+    global _client
+    previous, _client = _client, c
+    return previous
+
+
+def _term(binding):
+    """rdflib term of one SPARQL JSON value."""
+    kind = binding["type"]
+    if kind == "uri":
+        return URIRef(binding["value"])
+    if kind == "bnode":
+        return BNode(binding["value"])
+    datatype = binding.get("datatype")
+    return Literal(binding["value"], lang=binding.get("xml:lang"), datatype=URIRef(datatype) if datatype else None)
+
+
+def _remote_pattern(service):
+    """(group pattern text, its variables) of a SERVICE node, translated once."""
+    with _translate_lock:
+        if "remote_pattern" not in service:
+            # the parser's service_string repeats the first SERVICE of a query for all of them,
+            # so the pattern is serialized from its own parse tree instead
+            algebra = translateGroupGraphPattern(service.graph)
+            _traverseAgg(algebra, _addVars)
+            variables = sorted(algebra._vars)
+            select = CompValue("SelectQuery", p=Project(algebra, variables), PV=variables, datasetClause=None)
+            text = translateAlgebra(Query(None, select))
+            service["remote_pattern"] = (text[text.index("{") + 1:text.rindex("}")], set(variables))
+        return service["remote_pattern"]
+
+
+def _values_query(pattern, join_vars, keys):
+    if not join_vars:
+        return f"SELECT * WHERE {{ {pattern} }}"
+    rows = " ".join("(" + " ".join("UNDEF" if t is None else t.n3() for t in key) + ")" for key in keys)
+    return f"SELECT * WHERE {{ VALUES ({' '.join(v.n3() for v in join_vars)}) {{ {rows} }} {pattern} }}"
+
+
+def _key_text(join_vars, key):
+    # the variables are part of the key: the same pattern joined on ?a or on ?b answers differently
+    return "\t".join(f"{v}={t.n3()}" for v, t in zip(join_vars, key))
+
+
+def _compatible(row, remote):
+    return all(row.get(v) is None or row.get(v) == t for v, t in remote.items())
+
+
+class _ServiceJoin:
+    """One SERVICE pattern joined with a stream of local solutions."""
+
+    def __init__(self, ctx, service):
+        if not isinstance(service.term, URIRef):
+            raise SPARQLError("SERVICE with a variable endpoint is not supported.")
+        self.ctx = ctx
+        self.endpoint = str(service.term)
+        # CompValue.get returns the name of a missing key, so test for the key
+        self.silent = "silent" in service
+        self.client = client()
+        self.pattern, self.variables = _remote_pattern(service)
+        self.pattern_id = hashlib.sha1(self.pattern.encode("utf-8")).hexdigest()
+
+    def _fetch(self, join_vars, keys):
+        """Remote rows ({Variable: term}) for a batch of keys, or a pass-through row when SILENT fails."""
+        if self.endpoint not in self.client.endpoints:
+            error = f"SERVICE endpoint <{self.endpoint}> is not allowed (see GPU_LD_SERVICE_ENDPOINTS)."
+            if self.silent:
+                return [{}]
+            raise SPARQLError(error)
+        try:
+            bindings = self.client.select(self.endpoint, _values_query(self.pattern, join_vars, keys))
+        except (requests.RequestException, ValueError, KeyError) as e:
+            if self.silent:
+                return [{}]
+            raise SPARQLError(f"SERVICE <{self.endpoint}> failed: {e}")
+        return [{Variable(v): _term(b) for v, b in row.items()} for row in bindings]
+
+    def _answers(self, join_vars, keys):
+        """{key: [remote row]} for the distinct keys of a window, from the cache or the endpoint."""
+        cache = self.client.cache
+        complete = [k for k in keys if None not in k]
+        answers = {}
+        if cache is not None and join_vars:
+            cached = cache.get_many(self.endpoint, self.pattern_id, [_key_text(join_vars, k) for k in complete])
+            for key in complete:
+                text = _key_text(join_vars, key)
+                if text in cached:
+                    answers[key] = [{Variable(v): _term(b) for v, b in row.items()} for row in cached[text]]
+            self.client.cache_hits += len(answers)
+
+        missing = [k for k in keys if k not in answers]
+        if not join_vars:
+            batches = [missing[:1]] if missing else []
+        else:
+            batches = [missing[i:i + self.client.batch_size] for i in range(0, len(missing), self.client.batch_size)]
+        if not batches:
+            return answers
+        if len(batches) == 1 or self.client.max_concurrency <= 1:
+            results = [self._fetch(join_vars, batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(min(self.client.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(lambda batch: self._fetch(join_vars, batch), batches))
+
+        fresh = {}
+        for batch, rows in zip(batches, results):
+            index = {}
+            for row in rows:
+                index.setdefault(tuple(row.get(v) for v in join_vars), []).append(row)
+            for key in batch:
+                if None in key or rows == [{}]:
+                    # UNDEF in the key, or a failed SILENT call: match by compatibility
+                    answers[key] = [r for r in rows if _compatible(dict(zip(join_vars, key)), r)]
+                else:
+                    answers[key] = fresh[key] = index.get(key, [])
+        if cache is not None and join_vars and fresh:
+            cache.put_many(self.endpoint, self.pattern_id, {
+                _key_text(join_vars, k): [{str(v): _term_json(t) for v, t in row.items()} for row in rows]
+                for k, rows in fresh.items()})
+        return answers
+
+    def join(self, solutions, optional=False, expr=None):
+        """Solutions of solutions JOIN (or OPTIONAL, with expr) the SERVICE pattern."""
+        window_size = self.client.batch_size * max(self.client.max_concurrency, 1)
+        window = []
+        for solution in solutions:
+            window.append(solution)
+            if len(window) >= window_size:
+                yield from self._join_window(window, optional, expr)
+                window = []
+        if window:
+            yield from self._join_window(window, optional, expr)
+
+    def _join_window(self, window, optional, expr):
+        join_vars = sorted(v for v in self.variables if any(s.get(v) is not None for s in window))
+        keys_by_solution = []
+        keys = {}
+        for solution in window:
+            key = tuple(solution.get(v) for v in join_vars)
+            # a local blank node can never equal a remote term
+            keys_by_solution.append(None if any(isinstance(t, BNode) for t in key) else key)
+            if keys_by_solution[-1] is not None:
+                keys.setdefault(key, None)
+        answers = self._answers(join_vars, list(keys))
+
+        for solution, key in zip(window, keys_by_solution):
+            matched = False
+            for remote in answers.get(key, ()) if key is not None else ():
+                if not _compatible(solution, remote):
+                    continue
+                merged = solution.merge(remote)
+                if expr is not None:
+                    try:
+                        if not _ebv(expr, merged):
+                            continue
+                    except SPARQLError:
+                        continue
+                matched = True
+                yield merged
+            if optional and not matched:
+                yield solution
+
+
+def _is_service(node):
+    return isinstance(node, CompValue) and node.name == "ServiceGraphPattern"
+
+
+def _federated_eval(ctx, part):
+    if part.name == "Join" and _is_service(part.p2):
+        return _ServiceJoin(ctx, part.p2).join(evalPart(ctx, part.p1))
+    if part.name == "LeftJoin" and _is_service(part.p2):
+        return _ServiceJoin(ctx, part.p2).join(evalPart(ctx, part.p1), optional=True, expr=part.expr)
+    if _is_service(part):
+        # on its own, or inside a join the bind-join does not cover: the current solution is the left side
+        return _ServiceJoin(ctx, part).join([ctx.solution()])
+    raise NotImplementedError()
+
+
+CUSTOM_EVALS["federation"] = _federated_eval
@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+import random
+import streamlit as st
+from rdflib import Literal, Namespace, RDF, RDFS, URIRef
+from streamlit_agraph import agraph, Node, Edge, Config
+from src.product_table import facet_label
+
+EX = Namespace("http://example.org/gpu/")
+SCHEMA = Namespace("https://schema.org/")
+
+# Links that describe the vocabulary rather than the data; types are shown as node colours
+SKIP_PREDICATES = {RDF.type, RDFS.range, RDFS.domain, RDFS.subClassOf, RDFS.subPropertyOf}
+
+# Hard limit of nodes sent to the browser per render
+NODE_BUDGET = 150
+# Neighbours shown per (node, predicate, direction) before the rest is aggregated into one node
+GROUP_SAMPLE = 8
+
+TYPE_COLORS = {
+    SCHEMA.Product: "#76B900",
+    SCHEMA.Organization: "#E8710A",
+    EX.GPUArchitecture: "#1A73E8",
+    EX.MemorySize: "#9334E6",
+}
+EXTERNAL_COLOR = "#999999"
+MORE_COLOR = "#DDDDDD"
+
+
+@dataclass
+class AdjacencyIndex:
+    """IRI-to-IRI links of the graph grouped per node, predicate and direction."""
+    version: str = None
+    # node -> {(predicate, outgoing): [neighbour, ...]}
+    links: dict = field(default_factory=dict)
+    # node -> rdf:type used for its colour
+    types: dict = field(default_factory=dict)
+    # the start node choices: products sorted by name, and their names
+    products: list = field(default_factory=list)
+    names: dict = field(default_factory=dict)
+
+    def degree(self, node):
+        return sum(len(nodes) for nodes in self.links.get(node, {}).values())
+
+    def groups(self, node):
+        """[(predicate, outgoing, neighbours)], largest groups last."""
+        return sorted(((p, out, nodes) for (p, out), nodes in self.links.get(node, {}).items()),
+                      key=lambda item: (len(item[2]), str(item[0])))
+
+
+def build_adjacency_index(g, version=None):
+    """One pass over the triples (once per graph version)."""
+    index = AdjacencyIndex(version=version)
+    for s, p, o in g:
+        if p == RDF.type:
+            index.types.setdefault(s, o)
+            continue
+        if p in SKIP_PREDICATES or isinstance(o, Literal) or not isinstance(s, URIRef):
+            continue
+        index.links.setdefault(s, {}).setdefault((p, True), []).append(o)
+        index.links.setdefault(o, {}).setdefault((p, False), []).append(s)
+    for node, groups in index.links.items():
+        for (p, outgoing), nodes in groups.items():
+            # a fixed random order per group: its first n are the sample shown, and
+            # showing more extends the sample instead of drawing a new one
+            nodes.sort()
+            random.Random(str((str(node), str(p), outgoing))).shuffle(nodes)
+    for product in g.subjects(RDF.type, SCHEMA.Product):
+        index.names[product] = str(g.value(product, SCHEMA.name))
+    index.products = sorted(index.names, key=index.names.get)
+    return index
+
+
+def neighbourhood(adjacency, expanded, shown_more=None, budget=NODE_BUDGET, sample=GROUP_SAMPLE):
+    """
+    The nodes and edges to draw for the expanded nodes, in expansion order.
+    Each link group shows `sample` neighbours (more once its aggregate node
+    was clicked, see shown_more) and one aggregate node for the rest; the
+    whole view stops at `budget` nodes. Returns (nodes, edges, aggregates,
+    truncated) where aggregates maps an aggregate node id to its group.
+    """
+    shown_more = shown_more or {}
+    nodes, edges, aggregates = list(expanded[:budget]), [], {}
+    seen, edge_set = set(nodes), set()
+    truncated = len(expanded) > budget
+    for node in expanded[:budget]:
+        for predicate, outgoing, neighbours in adjacency.groups(node):
+            key = (str(node), str(predicate), outgoing)
+            picked = neighbours[:sample + shown_more.get(key, 0)]
+            for other in picked:
+                if other not in seen:
+                    if len(nodes) >= budget:
+                        truncated = True
+                        break
+                    seen.add(other)
+                    nodes.append(other)
+                edge = (node, predicate, other) if outgoing else (other, predicate, node)
+                if edge not in edge_set:
+                    edge_set.add(edge)
+                    edges.append(edge)
+            rest = len(neighbours) - len(picked)
+            if rest > 0 and len(nodes) < budget:
+                more_id = f"more|{key[0]}|{key[1]}|{int(outgoing)}"
+                aggregates[more_id] = (key, rest)
+                nodes.append(more_id)
+                edges.append((node, predicate, more_id) if outgoing else (more_id, predicate, node))
+    return nodes, edges, aggregates, truncated
+
+
+def _label(g, node):
+    label = facet_label(g, node)
+    return label if len(label) <= 28 else label[:27] + "…"
+
+
+def _tooltip(g, node, adjacency):
+    """Literal properties of the node, fetched for the drawn nodes only."""
+    lines = [str(node)]
+    for p, o in sorted(g.predicate_objects(node)):
+        if isinstance(o, Literal):
+            lines.append(f"{facet_label(g, p)}: {o}")
+    lines.append(f"{adjacency.degree(node):,} links")
+    return "\n".join(lines[:16])
+
+
+def show_explorer(g, adjacency=None):
+    st.subheader("Graph Explorer")
+
+    if adjacency is None:
+        adjacency = build_adjacency_index(g)
+
+    start_node = st.selectbox("Start from:", adjacency.products, index=None, placeholder="Pick a card",
+                              format_func=adjacency.names.get)
+    if start_node is None:
+        return
+
+    # expansion state is kept per start node
+    if st.session_state.get("explorer_start") != start_node:
+        st.session_state.explorer_start = start_node
+        st.session_state.explorer_expanded = [start_node]
+        st.session_state.explorer_more = {}
+    expanded = st.session_state.explorer_expanded
+    shown_more = st.session_state.explorer_more
+
+    nodes, edges, aggregates, truncated = neighbourhood(adjacency, expanded, shown_more)
+
+    drawn = []
+    for node in nodes:
+        if node in aggregates:
+            (_, predicate, _), rest = aggregates[node]
+            drawn.append(Node(id=node, label=f"+{rest:,} more", title=f"{rest:,} more via {facet_label(g, URIRef(predicate))}",
+                              color=MORE_COLOR, shape="box", size=12))
+            continue
+        color = TYPE_COLORS.get(adjacency.types.get(node), EXTERNAL_COLOR)
+        drawn.append(Node(id=str(node), label=_label(g, node), title=_tooltip(g, node, adjacency), color=color,
+                          size=25 if node in expanded else 15))
+    drawn_edges = [Edge(source=str(s), target=str(o), label=facet_label(g, p)) for s, p, o in edges]
+
+    clicked = agraph(nodes=drawn, edges=drawn_edges, config=Config(height=650, width=1100, directed=True, physics=True))
+
+    st.caption(f"{len(nodes)} of at most {NODE_BUDGET} nodes, {len(expanded)} expanded. "
+               "Click a node to expand it, or an aggregate node to show more of its group.")
+    if truncated:
+        st.warning("Node budget reached, further neighbours are hidden. Reset to start over.")
+    if st.button("Reset view"):
+        st.session_state.explorer_expanded = [start_node]
+        st.session_state.explorer_more = {}
+        st.rerun()
+
+    # a click reruns the script with the node id as the component's value. The value sticks
+    # while the drawn graph stays the same and resets to None once it changes (a new component),
+    # so the same node can be clicked again after the view it changed.
+    if not clicked:
+        st.session_state.explorer_clicked = None
+    elif clicked != st.session_state.get("explorer_clicked"):
+        st.session_state.explorer_clicked = clicked
+        if clicked in aggregates:
+            key, _ = aggregates[clicked]
+            shown_more[key] = shown_more.get(key, 0) + GROUP_SAMPLE
+        elif URIRef(clicked) not in expanded and len(nodes) < NODE_BUDGET:
+            expanded.append(URIRef(clicked))
+        st.rerun()
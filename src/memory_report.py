@@ -0,0 +1,273 @@
+"""
+Estimates where the memory of the loaded graph goes: bytes per predicate,
+distinct versus total terms per term type (what interning equal terms would
+save), the rdflib index structures, and the derived objects the app caches.
+
+    python -m src.memory_report [--data FILE ...] [--top 25] [--json report.json]
+
+Sizes are sys.getsizeof totals over the reachable objects, each object
+counted once, so they are estimates that leave out allocator overhead. The
+CLI also reports the tracemalloc total of the load to compare them with.
+"""
+import argparse
+import gc
+import json
+import resource
+import sys
+import time
+import tracemalloc
+import types
+from dataclasses import asdict, dataclass, field
+from rdflib import BNode, Literal
+from src.batch_runner import DATA_PATHS, load_graph
+
+TERM_KINDS = ("IRI", "blank node", "plain literal", "language literal", "typed literal")
+
+# Never part of a data structure's own footprint
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, types.FrameType)
+
+
+def deep_size(obj, seen=None):
+    """Bytes of obj and everything it references that is not in seen (updated in place)."""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _SHARED_TYPES):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        stack.extend(gc.get_referents(o))
+    return total
+
+
+def term_kind(term):
+    if isinstance(term, Literal):
+        if term.language:
+            return "language literal"
+        return "typed literal" if term.datatype else "plain literal"
+    return "blank node" if isinstance(term, BNode) else "IRI"
+
+
+@dataclass
+class PredicateFootprint:
+    predicate: str
+    triples: int = 0
+    distinct_objects: int = 0
+    # terms first seen in a triple of this predicate
+    term_bytes: int = 0
+    # the predicate's index entries plus its share of the per-triple bookkeeping
+    index_bytes: int = 0
+
+    @property
+    def total_bytes(self):
+        return self.term_bytes + self.index_bytes
+
+
+@dataclass
+class TermFootprint:
+    kind: str
+    # term positions in triples, distinct values, and distinct Python objects holding them
+    occurrences: int = 0
+    values: int = 0
+    objects: int = 0
+    bytes: int = 0
+    # bytes of the objects beyond the first per value: the saving of interning
+    duplicate_bytes: int = 0
+
+
+@dataclass
+class MemoryReport:
+    triples: int = 0
+    predicates: list = field(default_factory=list)
+    terms: list = field(default_factory=list)
+    # index structure -> bytes
+    index: dict = field(default_factory=dict)
+    # [(cache name, bytes not already counted for an earlier cache)]
+    caches: list = field(default_factory=list)
+    max_rss_bytes: int = 0
+    build_s: float = 0.0
+
+    @property
+    def term_bytes(self):
+        return sum(t.bytes for t in self.terms)
+
+    @property
+    def index_bytes(self):
+        return sum(self.index.values())
+
+    def to_dict(self):
+        out = asdict(self)
+        for p, footprint in zip(out["predicates"], self.predicates):
+            p["total_bytes"] = footprint.total_bytes
+        return out
+
+
+def _dict_bytes(d, depth):
+    """getsizeof of a nest of dicts depth levels deep; keys and leaf values are not included."""
+    total = sys.getsizeof(d)
+    if depth > 1:
+        total += sum(_dict_bytes(v, depth - 1) for v in d.values())
+    return total
+
+
+def index_footprint(store):
+    """
+    (structure -> bytes, {predicate: bytes of its own index entries}) for
+    rdflib's Memory store: the three nested dict indexes and the per-context
+    triple sets. Other stores are reported as one total.
+    """
+    spo = getattr(store, "_Memory__spo", None)
+    if spo is None:
+        return {f"{type(store).__name__} store": deep_size(store)}, {}
+    pos = store._Memory__pos
+    osp = store._Memory__osp
+    own = {p: _dict_bytes(objects, 2) for p, objects in pos.items()}
+    for po in spo.values():
+        for p, objects in po.items():
+            own[p] = own.get(p, 0) + sys.getsizeof(objects)
+    index = {
+        "spo index": _dict_bytes(spo, 3),
+        "pos index": _dict_bytes(pos, 3),
+        "osp index": _dict_bytes(osp, 3),
+    }
+    # every context keeps a set of its triples, and each triple is a tuple
+    contexts = store._Memory__contextTriples
+    seen = set()
+    tuples = 0
+    for triples in contexts.values():
+        for t in triples:
+            if id(t) not in seen:
+                seen.add(id(t))
+                tuples += sys.getsizeof(t)
+    index["context triple sets"] = sum(sys.getsizeof(s) for s in contexts.values())
+    index["triple tuples"] = tuples
+    index["triple contexts"] = sys.getsizeof(store._Memory__tripleContexts)
+    return index, own
+
+
+def graph_footprint(g):
+    """MemoryReport of the graph's terms and indexes (without caches)."""
+    start = time.perf_counter()
+    report = MemoryReport(triples=len(g))
+    seen = set()
+    kinds = {kind: TermFootprint(kind) for kind in TERM_KINDS}
+    # value -> [size of each distinct object]
+    objects = {}
+    by_predicate = {}
+    object_values = {}
+    for s, p, o in g:
+        footprint = by_predicate.get(p)
+        if footprint is None:
+            footprint = by_predicate[p] = PredicateFootprint(p.n3(g.namespace_manager))
+            object_values[p] = set()
+        footprint.triples += 1
+        object_values[p].add(o)
+        for term in (s, p, o):
+            kind = kinds[term_kind(term)]
+            kind.occurrences += 1
+            if id(term) in seen:
+                continue
+            size = deep_size(term, seen)
+            footprint.term_bytes += size
+            kind.objects += 1
+            kind.bytes += size
+            objects.setdefault(term, []).append(size)
+    for term, sizes in objects.items():
+        kind = kinds[term_kind(term)]
+        kind.values += 1
+        kind.duplicate_bytes += sum(sizes) - sizes[0]
+
+    report.index, own = index_footprint(g.store)
+    if hasattr(g, "terms"):
+        # the TermDictionary of an InternedGraph; its terms are counted above
+        report.index["term dictionary"] = sys.getsizeof(g.terms.terms)
+    shared = report.index_bytes - sum(own.values())
+    for p, footprint in by_predicate.items():
+        footprint.distinct_objects = len(object_values[p])
+        footprint.index_bytes = own.get(p, 0) + round(shared * footprint.triples / max(report.triples, 1))
+    report.predicates = sorted(by_predicate.values(), key=lambda f: f.total_bytes, reverse=True)
+    report.terms = [kinds[kind] for kind in TERM_KINDS if kinds[kind].occurrences]
+    report.max_rss_bytes = max_rss_bytes()
+    report.build_s = time.perf_counter() - start
+    return report
+
+
+def cache_footprint(resources):
+    """
+    [(name, bytes)] for {name: cached object}, in the given order. Objects
+    reachable from an earlier entry (e.g. the graph from a table built on it)
+    are not counted again.
+    """
+    seen = set()
+    return [(name, deep_size(obj, seen)) for name, obj in resources.items()]
+
+
+def max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def print_report(report, top=25):
+    print(f"{report.triples:,} triples, {format_bytes(report.term_bytes)} in terms, "
+          f"{format_bytes(report.index_bytes)} in indexes (estimated in {report.build_s:.2f} s)")
+
+    print(f"\n{'predicate':45} {'triples':>8} {'objects':>8} {'terms':>10} {'index':>10} {'total':>10}")
+    for p in report.predicates[:top]:
+        print(f"{p.predicate[:45]:45} {p.triples:8,} {p.distinct_objects:8,} {format_bytes(p.term_bytes):>10} "
+              f"{format_bytes(p.index_bytes):>10} {format_bytes(p.total_bytes):>10}")
+    if len(report.predicates) > top:
+        print(f"... {len(report.predicates) - top} more predicates")
+
+    print(f"\n{'term type':18} {'occurrences':>12} {'values':>8} {'objects':>8} {'bytes':>10} {'interning saves':>16}")
+    for t in report.terms:
+        print(f"{t.kind:18} {t.occurrences:12,} {t.values:8,} {t.objects:8,} {format_bytes(t.bytes):>10} "
+              f"{format_bytes(t.duplicate_bytes):>16}")
+
+    print("\nindex structures")
+    for name, size in report.index.items():
+        print(f"  {name:22} {format_bytes(size):>10}")
+
+    if report.caches:
+        print("\ncaches")
+        for name, size in report.caches:
+            print(f"  {name:22} {format_bytes(size):>10}")
+    print(f"\npeak RSS {format_bytes(report.max_rss_bytes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", nargs="+", default=list(DATA_PATHS), help="Turtle files to load")
+    parser.add_argument("--top", type=int, default=25, help="predicates to list")
+    parser.add_argument("--json", help="also write the report as JSON here")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    g = load_graph(args.data)
+    load_s = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"loaded in {load_s:.2f} s, tracemalloc: {format_bytes(traced)} held after the load\n")
+
+    report = graph_footprint(g)
+    print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"traced_bytes": traced, **report.to_dict()}, f, indent=1)
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
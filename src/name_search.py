@@ -0,0 +1,100 @@
+import re
+from dataclasses import dataclass, field
+import numpy as np
+
+# Product table columns searched, with the weight of a match in each
+SEARCH_COLUMNS = {"name": 1.0, "gpuName": 0.9, "gpuCodename": 0.9}
+
+# A row is returned when at least this share of the query's trigrams occur in one of its fields
+MIN_CONTAINMENT = 0.5
+DEFAULT_LIMIT = 20
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    """Lowercase words of letters and digits, separated by single spaces."""
+    return _NON_ALNUM.sub(" ", str(text).lower()).strip()
+
+
+def trigrams(text):
+    """Distinct character trigrams of the normalized text, padded so short words count too."""
+    padded = f"  {normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class NameSearchIndex:
+    """
+    Trigram inverted index over the searchable fields of the product table.
+    Every (row, field) pair is a document; a query only touches the posting
+    lists of its own trigrams, so its cost grows with the total length of
+    those lists (the documents sharing a trigram with it), not with the
+    number of documents.
+    """
+    version: str = None
+    # trigram -> document ids
+    postings: dict = field(default_factory=dict)
+    doc_row: np.ndarray = None
+    doc_size: np.ndarray = None
+    doc_weight: np.ndarray = None
+    n_rows: int = 0
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Returns [(row, score)] best first; score 1.0 is an exact trigram match."""
+        grams = trigrams(query)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not grams or not lists:
+            return []
+
+        # documents and how many of the query's trigrams they share, from the posting entries alone
+        docs, hits = np.unique(np.concatenate(lists), return_counts=True)
+        keep = hits >= MIN_CONTAINMENT * len(grams)
+        docs, hits = docs[keep], hits[keep]
+        if not len(docs):
+            return []
+        # mostly how much of the query was found, then how little else the field has
+        containment = hits / len(grams)
+        jaccard = hits / (len(grams) + self.doc_size[docs] - hits)
+        scores = (0.7 * containment + 0.3 * jaccard) * self.doc_weight[docs]
+
+        # best document per product row: sort by row, best score first, and keep the first of each row
+        doc_rows = self.doc_row[docs]
+        order = np.lexsort((-scores, doc_rows))
+        doc_rows, scores = doc_rows[order], scores[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = doc_rows[1:] != doc_rows[:-1]
+        rows, best = doc_rows[first], scores[first]
+        if len(rows) > limit:
+            top = np.argpartition(-best, limit)[:limit]
+            rows, best = rows[top], best[top]
+        order = np.lexsort((rows, -best))
+        return [(int(r), float(b)) for r, b in zip(rows[order], best[order])]
+
+
+def build_name_search(table, columns=SEARCH_COLUMNS):
+    """Indexes the product table's name columns (once per graph version)."""
+    postings = {}
+    doc_row, doc_size, doc_weight = [], [], []
+    for column, weight in columns.items():
+        if column not in table.columns:
+            continue
+        for row, text in enumerate(table.columns[column]):
+            if text is None:
+                continue
+            grams = trigrams(text)
+            doc = len(doc_row)
+            doc_row.append(row)
+            doc_size.append(len(grams))
+            doc_weight.append(weight)
+            for gram in grams:
+                postings.setdefault(gram, []).append(doc)
+
+    return NameSearchIndex(
+        version=table.version,
+        postings={gram: np.array(docs, dtype=np.int32) for gram, docs in postings.items()},
+        doc_row=np.array(doc_row, dtype=np.int32),
+        doc_size=np.array(doc_size),
+        doc_weight=np.array(doc_weight),
+        n_rows=len(table),
+    )
@@ -0,0 +1,109 @@
+from dataclasses import dataclass, field
+import numpy as np
+from rdflib import Literal, Namespace, RDF, RDFS
+from rdflib.namespace import XSD
+
+EX = Namespace("http://example.org/gpu/")
+SCHEMA = Namespace("https://schema.org/")
+
+# Product properties used by the app that are not declared in the vocabulary (to_rdf.RDF_PROPERTIES)
+EXTRA_COLUMNS = {
+    SCHEMA.name: XSD.string,
+    SCHEMA.manufacturer: RDFS.Resource,
+    SCHEMA.price: XSD.integer,
+    SCHEMA.releaseDate: XSD.date,
+    EX.memorySize: RDFS.Resource,
+    EX.memBus: RDFS.Resource,
+}
+
+# Ranges stored as float64 columns (NaN = missing); everything else is an object column of str / None
+NUMERIC_RANGES = {XSD.integer, XSD.int, XSD.long, XSD.decimal, XSD.float, XSD.double}
+
+
+def facet_label(g, term):
+    """Value shown in the dropdown: literal text, else the node's name, else its local name."""
+    if isinstance(term, Literal):
+        return str(term)
+    name = g.value(term, SCHEMA.name)
+    label = str(name) if name is not None else str(term)
+    return label.split('/')[-1].split('#')[-1]
+
+
+def column_name(predicate):
+    """Column of a predicate: its local name, e.g. ex:tdpWatts -> "tdpWatts"."""
+    return str(predicate).rstrip("/#").replace("#", "/").split("/")[-1]
+
+
+@dataclass
+class ProductTable:
+    """
+    Columnar projection of all schema:Product nodes: row i of every column
+    describes iris[i]. Numeric properties are float64 arrays with NaN for
+    missing values, the rest are object arrays of labels with None.
+    """
+    version: str = None
+    iris: np.ndarray = None
+    columns: dict = field(default_factory=dict)
+    # column -> predicate IRI it was projected from
+    predicates: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.iris)
+
+    def is_numeric(self, column):
+        return self.columns[column].dtype.kind == "f"
+
+    def present(self, column):
+        """Mask of the rows that have a value in the column."""
+        values = self.columns[column]
+        return ~np.isnan(values) if self.is_numeric(column) else values != None  # noqa: E711
+
+    def ranked(self, mask, column):
+        """Row indices selected by mask that have a value in column, in ascending order of it."""
+        rows = np.flatnonzero(mask & self.present(column))
+        return rows[np.argsort(self.columns[column][rows], kind="stable")]
+
+
+def _column_ranges(g):
+    """Declared rdfs:range of every rdf:Property in the graph plus EXTRA_COLUMNS."""
+    ranges = {}
+    for prop in g.subjects(RDF.type, RDF.Property):
+        rng = g.value(prop, RDFS.range)
+        if rng is not None:
+            ranges[prop] = rng
+    for prop, rng in EXTRA_COLUMNS.items():
+        ranges.setdefault(prop, rng)
+    return ranges
+
+
+def build_product_table(g, version=None):
+    """Projects the products of g into a ProductTable, one pass per property."""
+    iris = sorted(g.subjects(RDF.type, SCHEMA.Product))
+    position = {iri: i for i, iri in enumerate(iris)}
+    table = ProductTable(version=version, iris=np.array(iris, dtype=object))
+
+    for prop, rng in _column_ranges(g).items():
+        numeric = rng in NUMERIC_RANGES
+        values = np.full(len(iris), np.nan) if numeric else np.full(len(iris), None, dtype=object)
+        labels = {}
+        for s, o in g.subject_objects(prop):
+            i = position.get(s)
+            if i is None:
+                continue
+            if numeric:
+                values[i] = float(o.toPython()) if isinstance(o, Literal) else np.nan
+            else:
+                if o not in labels:
+                    labels[o] = facet_label(g, o)
+                values[i] = labels[o]
+        name = column_name(prop)
+        table.columns[name] = values
+        table.predicates[name] = prop
+
+    # derived columns (no predicate of their own)
+    if "fp32GFlops" in table.columns and "tdpWatts" in table.columns:
+        watts = table.columns["tdpWatts"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            efficiency = table.columns["fp32GFlops"] / np.where(watts > 0, watts, np.nan)
+        table.columns["gflopsPerWatt"] = efficiency
+    return table
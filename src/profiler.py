@@ -0,0 +1,180 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from rdflib.plugins.sparql import CUSTOM_EVALS, parser
+from rdflib.plugins.sparql.algebra import translateQuery
+from rdflib.plugins.sparql.evaluate import evalPart, evalQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+from src.rewriter import rewrite_query
+
+# Algebra operators are chained through these keys; everything else is an expression
+_CHILD_KEYS = ("p", "p1", "p2")
+
+_state = threading.local()
+_lock = threading.Lock()
+_active_profiles = 0
+
+
+@dataclass
+class OperatorStats:
+    calls: int = 0
+    rows: int = 0
+    time: float = 0.0
+
+
+@dataclass
+class QueryProfile:
+    """Timings of one profiled query. Plain data, so it can cross processes."""
+    parse_s: float = 0.0
+    translate_s: float = 0.0
+    rewrite_s: float = 0.0
+    evaluate_s: float = 0.0
+    result_rows: int = 0
+    # one dict per algebra node in tree order: depth, operator, detail, calls, rows, total_ms, self_ms
+    operators: list = field(default_factory=list)
+
+    @property
+    def total_s(self):
+        return self.parse_s + self.translate_s + self.rewrite_s + self.evaluate_s
+
+    def explain(self):
+        """Indented text rendering of the operator tree with its timings."""
+        lines = []
+        for op in self.operators:
+            label = "  " * op["depth"] + op["operator"]
+            if op["detail"]:
+                label += f" {op['detail']}"
+            lines.append(f"{label:<70} calls={op['calls']:<6} rows={op['rows']:<8} "
+                         f"total={op['total_ms']:.2f} ms  self={op['self_ms']:.2f} ms")
+        return "\n".join(lines)
+
+
+def _timed(it, stats):
+    """Wraps an operator's output, charging the time spent producing each row."""
+    it = iter(it)
+    while True:
+        t = time.perf_counter()
+        try:
+            row = next(it)
+        except StopIteration:
+            stats.time += time.perf_counter() - t
+            return
+        stats.time += time.perf_counter() - t
+        stats.rows += 1
+        yield row
+
+
+def _profiling_eval(ctx, part):
+    stats_by_node = getattr(_state, "stats", None)
+    if stats_by_node is None or getattr(_state, "bypass", None) is part:
+        # not profiling in this thread, or we are re-dispatching this very node
+        _state.bypass = None
+        raise NotImplementedError()
+
+    stats = stats_by_node.setdefault(id(part), OperatorStats())
+    stats.calls += 1
+
+    t = time.perf_counter()
+    _state.bypass = part
+    res = evalPart(ctx, part)
+    stats.time += time.perf_counter() - t
+
+    if isinstance(res, dict):
+        # query forms return a dict; the rows are under "bindings"
+        if "bindings" in res:
+            res["bindings"] = _timed(res["bindings"], stats)
+        return res
+    if isinstance(res, list):
+        # eagerly evaluated operators (Union, OrderBy ...) did their work above
+        stats.rows += len(res)
+        return res
+    return _timed(res, stats)
+
+
+def _describe(node):
+    if node.name == "BGP":
+        return "{ " + " . ".join(" ".join(t.n3() for t in triple) for triple in node.triples) + " }"
+    if node.name == "Project":
+        return " ".join(v.n3() for v in node.PV)
+    if node.name == "Slice":
+        return f"start={node.start} length={node.length}"
+    if node.name == "Join":
+        return "(lazy)" if node.lazy else "(hash)"
+    if node.name == "Extend":
+        return node.var.n3()
+    if node.name == "OrderBy":
+        return " ".join(f"{e.order or 'ASC'}({e.expr.n3() if hasattr(e.expr, 'n3') else e.expr.name})" for e in node.expr)
+    return ""
+
+
+def _collect(node, stats_by_node, depth, out):
+    """Flattens the algebra tree (pre-order) and returns the node's total time."""
+    stats = stats_by_node.get(id(node), OperatorStats())
+    entry = {
+        "depth": depth,
+        "operator": node.name,
+        "detail": _describe(node),
+        "calls": stats.calls,
+        "rows": stats.rows,
+        "total_ms": stats.time * 1000,
+        "self_ms": 0.0,
+    }
+    out.append(entry)
+    children_time = 0.0
+    for key in _CHILD_KEYS:
+        child = node.get(key)
+        if isinstance(child, CompValue):
+            children_time += _collect(child, stats_by_node, depth + 1, out)
+    entry["self_ms"] = max(0.0, stats.time - children_time) * 1000
+    return stats.time
+
+
+def profile_query(g, query, initNs=None, stats=None):
+    """
+    Parses, translates and evaluates a SPARQL query on graph g, recording the
+    time and number of rows produced by every algebra operator. With graph
+    statistics the query is rewritten (see rewriter.py) before evaluation.
+
+    Can be called from Python, e.g. profile_query(g, build_wiki_query(...)).explain()
+    """
+    global _active_profiles
+    profile = QueryProfile()
+
+    t = time.perf_counter()
+    parsed = parser.parseQuery(query)
+    profile.parse_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    prepared = translateQuery(parsed, initNs=dict(g.namespaces()) if initNs is None else initNs)
+    profile.translate_s = time.perf_counter() - t
+
+    if stats is not None:
+        t = time.perf_counter()
+        prepared = rewrite_query(prepared, stats)
+        profile.rewrite_s = time.perf_counter() - t
+
+    with _lock:
+        _active_profiles += 1
+        CUSTOM_EVALS["profiler"] = _profiling_eval
+    _state.stats = {}
+    try:
+        t = time.perf_counter()
+        res = evalQuery(g, prepared)
+        if "bindings" in res:
+            profile.result_rows = sum(1 for _ in res["bindings"])
+        elif "graph" in res:
+            profile.result_rows = len(res["graph"])
+        else:
+            profile.result_rows = 1
+        profile.evaluate_s = time.perf_counter() - t
+        stats_by_node = _state.stats
+    finally:
+        _state.stats = None
+        _state.bypass = None
+        with _lock:
+            _active_profiles -= 1
+            if _active_profiles == 0:
+                CUSTOM_EVALS.pop("profiler", None)
+
+    _collect(prepared.algebra, stats_by_node, 0, profile.operators)
+    return profile
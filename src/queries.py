@@ -0,0 +1,119 @@
+"""
+SPARQL the app issues, kept free of Streamlit so scripts (benchmarks,
+src.batch_runner) can build the same queries.
+"""
+from rdflib import Literal
+
+# Preset queries of the SPARQL console
+CONSOLE_TEMPLATES = {
+    "All GPUs made by NVIDIA": "SELECT ?gpu ?name ?year WHERE {\n?gpu <https://schema.org/manufacturer> <http://example.org/gpu/NVIDIA> ;\n<https://schema.org/name> ?name ;\n<http://example.org/gpu/releaseYear> ?year.}",
+    "Top 10 GPUs by TDP": "SELECT ?name ?tdp WHERE {\n  ?gpu <http://example.org/gpu/tdpWatts> ?tdp ;\n       <https://schema.org/name> ?name .\n} ORDER BY DESC(?tdp) LIMIT 10",
+    "Count of GPUs by year": "SELECT ?year (COUNT(?gpu) AS ?count) WHERE {\n  ?gpu <http://example.org/gpu/releaseYear> ?year .\n} GROUP BY ?year ORDER BY ?year",
+    "Show all custom made predicates":"SELECT ?label ?iri ?range ?comment WHERE {\n?iri a <http://www.w3.org/1999/02/22-rdf-syntax-ns#Property>;\n<http://www.w3.org/2000/01/rdf-schema#comment> ?comment;\n<http://www.w3.org/2000/01/rdf-schema#range> ?range;\n<http://www.w3.org/2000/01/rdf-schema#label> ?label.}",
+    "Show all used predicates":"SELECT DISTINCT ?p WHERE {\n  ?s ?p ?o .\n}",
+    "TDP of a card across releases": "SELECT ?release ?tdp WHERE {\n  GRAPH ?release {\n    ?gpu <https://schema.org/name> \"GeForce RTX 4090\"@en ;\n         <http://example.org/gpu/tdpWatts> ?tdp .\n  }\n} ORDER BY ?release",
+    "Stock from the inventory service (SERVICE)": "PREFIX inv: <http://example.org/inventory/>\nSELECT ?name ?year ?stock ?warehouse WHERE {\n  ?gpu <https://schema.org/manufacturer> <http://example.org/gpu/NVIDIA> ;\n       <https://schema.org/name> ?name ;\n       <http://example.org/gpu/releaseYear> ?year .\n  FILTER(?year >= 2020)\n  SERVICE <http://127.0.0.1:3031/sparql> {\n    ?gpu inv:stock ?stock ; inv:warehouse ?warehouse .\n  }\n} ORDER BY DESC(?stock) ?name",
+    "Custom query":"# Write your custom SPARQL query here"
+}
+
+# Ranking criterion -> predicate of the value it ranks by
+RANK_CRITERIA = {
+    "Performance (GFLOPS)": "ex:fp32GFlops",
+    "TDP (W)": "ex:tdpWatts",
+    "Price ($)": "schema:price",
+    "Number of cores": "ex:shadingUnits",
+    "Base clock (MHz)": "ex:baseClockMHz",
+    "Boost clock (MHz)": "ex:boostClockMHz",
+    "Max clock (MHz)": "ex:maxClockMHz",
+    "Memory size (KB)": "ex:memorySizeKB",
+    "Bandwidth (MB/s)": "ex:bandwidthMBs",
+    "Efficiency (GFLOPS/W)": "ex:gflopsPerWatt",
+}
+
+# Criteria computed from other properties: predicate -> graph pattern binding ?val
+DERIVED_CRITERIA = {
+    "ex:gflopsPerWatt": "?gpu ex:fp32GFlops ?flops ; ex:tdpWatts ?tdp . FILTER(?tdp > 0) BIND(?flops / ?tdp AS ?val)",
+}
+
+# Facet -> pattern binding ?f{i} to the value its label is compared with (see product_table.facet_label)
+FACET_PATTERNS = {
+    "Brand": "?gpu schema:manufacturer ?brand{i} . ?brand{i} schema:name ?f{i}",
+    "Architecture": "?gpu ex:hasArchitecture ?arch{i} . ?arch{i} schema:name ?f{i}",
+    "Release Year": "?gpu ex:releaseYear ?f{i}",
+    "Memory Size": "?gpu ex:memorySize ?ms{i} . BIND(REPLACE(STR(?ms{i}), \"^.*[/#]\", \"\") AS ?f{i})",
+    "Memory Type": "?gpu ex:memoryType ?f{i}",
+    "Memory Bus": "?gpu ex:memBus ?mb{i} . BIND(REPLACE(STR(?mb{i}), \"^.*[/#]\", \"\") AS ?f{i})",
+}
+
+def _string_literal(value):
+    """value as a quoted SPARQL string, with quotes, backslashes and line breaks escaped."""
+    return Literal(str(value)).n3()
+
+
+def build_wiki_query(filter_type, filter_value, target_predicate="schema:name"):
+    """
+    Builds the SPARQL query the encyclopedia runs for one filter and ranking
+    predicate. Usable from Python as well, e.g. with profiler.profile_query.
+    """
+    # Build filter clause
+    filter_clause = ""
+    literal = _string_literal(filter_value)
+    if filter_type == "Brand":
+        filter_clause = f'?gpu schema:manufacturer ?brand_uri . ?brand_uri <https://schema.org/name> ?bn . FILTER(STR(?bn) = {literal})'
+    elif filter_type == "Architecture":
+        filter_clause = f'?gpu ex:hasArchitecture ?arch_uri . ?arch_uri <https://schema.org/name> ?an . FILTER(STR(?an) = {literal})'
+    elif filter_type == "Release Year":
+        filter_clause = f'FILTER(?year = {int(filter_value)})'
+    elif filter_type == "Memory Size":
+        filter_clause = f'?gpu <http://example.org/gpu/memorySize> ?ms . FILTER(REPLACE(STR(?ms), "^.*[/#]", "") = {literal})'
+    elif filter_type == "Memory Type":
+        filter_clause = f'?gpu <http://example.org/gpu/memoryType> ?mt . FILTER(STR(?mt) = {literal})'
+    elif filter_type == "Memory Bus":
+        filter_clause = f'?gpu <http://example.org/gpu/memBus> ?mb . FILTER(REPLACE(STR(?mb), "^.*[/#]", "") = {literal})'
+
+    return f"""
+    PREFIX ex: <http://example.org/gpu/>
+    PREFIX schema: <https://schema.org/>
+    SELECT DISTINCT ?gpu ?name ?val ?year WHERE {{
+        ?gpu a schema:Product ;
+             schema:name ?name ;
+             {target_predicate} ?val .
+        
+        OPTIONAL {{ ?gpu schema:manufacturer ?brand_uri }}
+        OPTIONAL {{ ?gpu ex:hasArchitecture ?arch_uri }}
+        OPTIONAL {{ ?gpu ex:releaseYear ?year }}
+        {filter_clause}
+    }} ORDER BY ?val
+    """
+
+
+def build_facet_query(selections, ranges, predicates, target_predicate="schema:name"):
+    """
+    SPARQL equivalent of a multi-facet selection: values within a facet are
+    alternatives, facets and ranges must all hold. ranges maps a product
+    table column to (low, high) in its own units, predicates maps it to the
+    predicate IRI (ProductTable.predicates).
+    """
+    clauses = []
+    for i, (facet, values) in enumerate(selections.items()):
+        if not values:
+            continue
+        pattern = FACET_PATTERNS[facet].format(i=i)
+        literals = ", ".join(_string_literal(value) for value in values)
+        clauses.append(f"{{ {pattern} . FILTER(STR(?f{i}) IN ({literals})) }}")
+    for i, (column, (low, high)) in enumerate(ranges.items()):
+        clauses.append(f"?gpu <{predicates[column]}> ?r{i} . FILTER(?r{i} >= {low} && ?r{i} <= {high})")
+
+    target = DERIVED_CRITERIA.get(target_predicate, f"?gpu {target_predicate} ?val .")
+    filters = "\n        ".join(clauses)
+    return f"""
+    PREFIX ex: <http://example.org/gpu/>
+    PREFIX schema: <https://schema.org/>
+    SELECT DISTINCT ?gpu ?name ?val ?year WHERE {{
+        ?gpu a schema:Product ;
+             schema:name ?name .
+        {target}
+        OPTIONAL {{ ?gpu ex:releaseYear ?year }}
+        {filters}
+    }} ORDER BY ?val
+    """
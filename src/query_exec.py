@@ -0,0 +1,269 @@
+import multiprocessing as mp
+import threading
+import time
+from dataclasses import dataclass, field
+from rdflib.plugins.sparql.parserutils import CompValue
+from src.rewriter import optimized_query
+
+# Default limits for queries typed into the SPARQL console
+DEFAULT_TIMEOUT_S = 30.0
+DEFAULT_MAX_ROWS = 10_000
+DEFAULT_PAGE_SIZE = 100
+
+# Rows are sent from the worker to the app in chunks of this size
+CHUNK_SIZE = 500
+
+# How often the waiting side wakes up to check the clock / report progress
+POLL_INTERVAL_S = 0.1
+
+
+@dataclass
+class QueryOutcome:
+    """Result of a console query run under a time and row limit."""
+    kind: str = "SELECT"
+    vars: list = field(default_factory=list)
+    rows: list = field(default_factory=list)
+    ask: bool = None
+    error: str = None
+    timed_out: bool = False
+    truncated: bool = False
+    count: int = None
+    elapsed: float = 0.0
+
+
+def paginate_query(g, query, offset, limit, stats=None):
+    """
+    Prepares a SELECT query restricted to one page of its results by wrapping
+    the algebra in a Slice (equivalent to adding LIMIT/OFFSET). An existing
+    LIMIT/OFFSET of the query is respected. Other query forms are returned
+    prepared but unpaged. With graph statistics the query is rewritten first.
+    """
+    q = optimized_query(g, query, stats)
+    if q.algebra.name != "SelectQuery":
+        return q
+
+    inner = q.algebra.p
+    start, length = offset, limit
+    if inner.name == "Slice":
+        start = (inner.start or 0) + offset
+        if inner.length is not None:
+            length = max(0, min(limit, inner.length - offset))
+        inner = inner.p
+
+    q.algebra.p = CompValue("Slice", p=inner, start=start, length=length)
+    return q
+
+
+def _result_chunks(g, query, max_rows, count_only=False):
+    """Evaluates the query and yields protocol messages for the caller."""
+    if callable(query):
+        # prepared here, so parsing and rewriting are under the time limit too
+        query = query()
+    results = g.query(query)
+    yield ("kind", results.type)
+
+    if results.type == "ASK":
+        yield ("ask", bool(results.askAnswer))
+        return
+
+    if results.type == "SELECT":
+        yield ("vars", [str(v) for v in results.vars])
+        rows = (tuple(row) for row in results)
+    else:
+        # CONSTRUCT / DESCRIBE return a graph, shown as s/p/o rows
+        yield ("vars", ["s", "p", "o"])
+        rows = iter(results.graph)
+
+    if count_only:
+        yield ("count", sum(1 for _ in rows))
+        return
+
+    chunk = []
+    count = 0
+    for row in rows:
+        if count >= max_rows:
+            yield ("truncated", None)
+            break
+        chunk.append(row)
+        count += 1
+        if len(chunk) >= CHUNK_SIZE:
+            yield ("rows", chunk)
+            chunk = []
+    if chunk:
+        yield ("rows", chunk)
+
+
+def _worker(conn, g, query, max_rows, count_only):
+    try:
+        for msg in _result_chunks(g, query, max_rows, count_only):
+            conn.send(msg)
+        conn.send(("done", None))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def _apply(outcome, msg, on_rows=None):
+    """Folds one worker message into the outcome. Returns True when finished."""
+    kind, payload = msg
+    if kind == "kind":
+        outcome.kind = payload
+    elif kind == "vars":
+        outcome.vars = payload
+    elif kind == "rows":
+        if on_rows:
+            on_rows(outcome.vars, payload)
+        else:
+            outcome.rows.extend(payload)
+    elif kind == "ask":
+        outcome.ask = payload
+    elif kind == "truncated":
+        outcome.truncated = True
+    elif kind == "count":
+        outcome.count = payload
+    elif kind == "error":
+        outcome.error = payload
+        return True
+    elif kind == "done":
+        return True
+    return False
+
+
+def _run_in_process(g, query, timeout_s, max_rows, count_only, on_rows, on_progress):
+    """
+    Runs the query in a forked child which shares the graph copy-on-write.
+    The child is killed once the deadline passes or the caller is interrupted.
+    """
+    ctx = mp.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_worker, args=(child_conn, g, query, max_rows, count_only), daemon=True)
+
+    outcome = QueryOutcome()
+    start = time.monotonic()
+    proc.start()
+    child_conn.close()
+    try:
+        finished = False
+        while not finished:
+            elapsed = time.monotonic() - start
+            if elapsed >= timeout_s:
+                outcome.timed_out = True
+                break
+            if parent_conn.poll(min(POLL_INTERVAL_S, timeout_s - elapsed)):
+                try:
+                    finished = _apply(outcome, parent_conn.recv(), on_rows)
+                except EOFError:
+                    outcome.error = "Query worker exited unexpectedly."
+                    break
+            elif not proc.is_alive() and not parent_conn.poll():
+                outcome.error = "Query worker exited unexpectedly."
+                break
+            if on_progress:
+                on_progress(time.monotonic() - start, len(outcome.rows))
+    finally:
+        parent_conn.close()
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+
+    outcome.elapsed = time.monotonic() - start
+    return outcome
+
+
+def _run_in_thread(g, query, timeout_s, max_rows, count_only, on_rows, on_progress):
+    """
+    Fallback for platforms without fork. Rows are pulled in a daemon thread
+    which stops at the next row once cancelled, so the session is released
+    on time even if the evaluator itself cannot be interrupted.
+    """
+    outcome = QueryOutcome()
+    cancelled = threading.Event()
+    done = threading.Event()
+
+    def consume():
+        try:
+            for msg in _result_chunks(g, query, max_rows, count_only):
+                if cancelled.is_set():
+                    return
+                if _apply(outcome, msg, on_rows):
+                    return
+        except Exception as e:
+            outcome.error = str(e)
+        finally:
+            done.set()
+
+    start = time.monotonic()
+    threading.Thread(target=consume, daemon=True).start()
+    try:
+        while not done.wait(POLL_INTERVAL_S):
+            if time.monotonic() - start >= timeout_s:
+                outcome.timed_out = True
+                break
+            if on_progress:
+                on_progress(time.monotonic() - start, len(outcome.rows))
+    finally:
+        cancelled.set()
+
+    outcome.elapsed = time.monotonic() - start
+    outcome.rows = list(outcome.rows)
+    return outcome
+
+
+def _call_worker(conn, fn, args):
+    try:
+        conn.send(("result", fn(*args)))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def run_in_worker(fn, args=(), timeout_s=DEFAULT_TIMEOUT_S):
+    """
+    Calls fn(*args) in a forked child under the same wall-clock limit as
+    run_query and returns (result, error, timed_out). The result must be
+    picklable. Without fork the call runs inline.
+    """
+    if "fork" not in mp.get_all_start_methods():
+        try:
+            return fn(*args), None, False
+        except Exception as e:
+            return None, str(e), False
+
+    ctx = mp.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_call_worker, args=(child_conn, fn, args), daemon=True)
+    proc.start()
+    child_conn.close()
+    try:
+        if not parent_conn.poll(timeout_s):
+            return None, None, True
+        kind, payload = parent_conn.recv()
+        return (payload, None, False) if kind == "result" else (None, payload, False)
+    except EOFError:
+        return None, "Query worker exited unexpectedly.", False
+    finally:
+        parent_conn.close()
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+
+
+def run_query(g, query, timeout_s=DEFAULT_TIMEOUT_S, max_rows=DEFAULT_MAX_ROWS, count_only=False,
+              on_rows=None, on_progress=None):
+    """
+    Runs a SPARQL query (string, prepared, or a function returning a prepared
+    query, which is called in the worker) with a wall-clock timeout and a
+    result-row cap. With count_only the rows are counted in the worker and
+    only outcome.count is returned.
+
+    on_rows(vars, rows) receives each chunk of rows as it arrives instead of
+    collecting them in outcome.rows (used by the exports).
+
+    on_progress(elapsed_s, rows_received) is called while waiting, which also
+    gives Streamlit a chance to stop the script (the worker is reclaimed).
+    """
+    if "fork" in mp.get_all_start_methods():
+        return _run_in_process(g, query, timeout_s, max_rows, count_only, on_rows, on_progress)
+    return _run_in_thread(g, query, timeout_s, max_rows, count_only, on_rows, on_progress)
@@ -0,0 +1,224 @@
+import hashlib
+import http.server
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything can be moved or tuned through the environment
+LOG_DIR = os.environ.get("GPU_LD_LOG_DIR", os.path.join(BASE_DIR, "logs"))
+QUERY_LOG_PATH = os.path.join(LOG_DIR, "queries.jsonl")
+SLOW_QUERY_LOG_PATH = os.path.join(LOG_DIR, "slow_queries.jsonl")
+METRICS_PATH = os.path.join(LOG_DIR, "metrics.prom")
+SLOW_QUERY_THRESHOLD_S = float(os.environ.get("GPU_LD_SLOW_QUERY_S", "1.0"))
+# Set to serve /metrics over HTTP as well (e.g. 9464); the file is always written
+METRICS_PORT = int(os.environ.get("GPU_LD_METRICS_PORT", "0"))
+
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 3
+
+# Histogram buckets for query latency in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Distinct query shapes kept as separate series; the rest share shape="other"
+MAX_SHAPES = 200
+
+_COMMENT = re.compile(r"#[^\n<>\"']*$", re.MULTILINE)
+_STRING = re.compile(r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r"(?<![\w:?$])[+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Query text without comments and with whitespace collapsed."""
+    return _SPACE.sub(" ", _COMMENT.sub("", query)).strip()
+
+
+def query_shape(normalized):
+    """The normalized query with string and number constants replaced by '?'."""
+    return _NUMBER.sub("?", _STRING.sub("?", normalized))
+
+
+def _digest(text, length=16):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:length]
+
+
+def _file_logger(name, path):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                       encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class QueryMetrics:
+    """Prometheus counters and histograms, kept in memory and rendered as text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}     # (source, shape) -> [bucket counts..., +Inf count, sum]
+        self.queries = {}        # (source, status) -> count
+        self.cache = {}          # (source, "hit"/"miss") -> count
+        self.graph_loads = 0
+        self.graph_reloads = 0
+        self.graph_load_seconds = 0.0
+
+    def observe(self, source, shape, duration_s, status, cache_hit):
+        with self._lock:
+            if (source, shape) not in self.histograms and len(self.histograms) >= MAX_SHAPES:
+                shape = "other"
+            hist = self.histograms.setdefault((source, shape), [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration_s <= bound:
+                    hist[i] += 1
+            hist[len(LATENCY_BUCKETS)] += 1
+            hist[-1] += duration_s
+            self.queries[(source, status)] = self.queries.get((source, status), 0) + 1
+            if cache_hit is not None:
+                key = (source, "hit" if cache_hit else "miss")
+                self.cache[key] = self.cache.get(key, 0) + 1
+
+    def graph_loaded(self, seconds):
+        with self._lock:
+            if self.graph_loads:
+                self.graph_reloads += 1
+            self.graph_loads += 1
+            self.graph_load_seconds = seconds
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            lines = [
+                "# HELP gpu_ld_query_duration_seconds SPARQL query latency by source and query shape.",
+                "# TYPE gpu_ld_query_duration_seconds histogram",
+            ]
+            for (source, shape), hist in sorted(self.histograms.items()):
+                labels = f'source="{source}",shape="{shape}"'
+                for bound, count in zip(LATENCY_BUCKETS, hist):
+                    lines.append(f'gpu_ld_query_duration_seconds_bucket{{{labels},le="{bound:g}"}} {count}')
+                lines.append(f'gpu_ld_query_duration_seconds_bucket{{{labels},le="+Inf"}} {hist[len(LATENCY_BUCKETS)]}')
+                lines.append(f"gpu_ld_query_duration_seconds_sum{{{labels}}} {hist[-1]:.6f}")
+                lines.append(f"gpu_ld_query_duration_seconds_count{{{labels}}} {hist[len(LATENCY_BUCKETS)]}")
+
+            lines += ["# HELP gpu_ld_queries_total Queries run, by source and outcome.",
+                      "# TYPE gpu_ld_queries_total counter"]
+            for (source, status), count in sorted(self.queries.items()):
+                lines.append(f'gpu_ld_queries_total{{source="{source}",status="{status}"}} {count}')
+
+            lines += ["# HELP gpu_ld_query_cache_total Result cache lookups, by source and result.",
+                      "# TYPE gpu_ld_query_cache_total counter"]
+            for (source, result), count in sorted(self.cache.items()):
+                lines.append(f'gpu_ld_query_cache_total{{source="{source}",result="{result}"}} {count}')
+
+            lines += [
+                "# HELP gpu_ld_graph_loads_total Times the RDF graph was loaded into this process.",
+                "# TYPE gpu_ld_graph_loads_total counter",
+                f"gpu_ld_graph_loads_total {self.graph_loads}",
+                "# HELP gpu_ld_graph_reloads_total Graph loads after the first one (cache cleared, data changed).",
+                "# TYPE gpu_ld_graph_reloads_total counter",
+                f"gpu_ld_graph_reloads_total {self.graph_reloads}",
+                "# HELP gpu_ld_graph_load_seconds Duration of the latest graph load.",
+                "# TYPE gpu_ld_graph_load_seconds gauge",
+                f"gpu_ld_graph_load_seconds {self.graph_load_seconds:.6f}",
+            ]
+            return "\n".join(lines) + "\n"
+
+
+metrics = QueryMetrics()
+_write_lock = threading.Lock()
+_server = None
+
+
+def write_metrics_file(path=METRICS_PATH):
+    """Writes the metrics atomically, for a node_exporter textfile collector or a curious admin."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _write_lock:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(metrics.render())
+        os.replace(tmp, path)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serves /metrics on localhost in a daemon thread (once per process). Port 0 disables it."""
+    global _server
+    with _write_lock:
+        if not port or _server is not None:
+            return _server
+        try:
+            _server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError:
+            logging.getLogger(__name__).exception("Could not serve metrics on port %s", port)
+            return None
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+
+def record_query(source, query, duration_s, rows=None, cache_hit=None, session_id=None,
+                 queue_s=None, error=None, timed_out=False):
+    """
+    Logs one query as a JSON line, also to the slow-query log when it took
+    longer than SLOW_QUERY_THRESHOLD_S, and updates the metrics.
+    Logging problems never reach the user.
+    """
+    try:
+        text = query if isinstance(query, str) else getattr(query, "_original_args", ("",))[0]
+        normalized = normalize_query(text)
+        shape = query_shape(normalized)
+        status = "error" if error else "timeout" if timed_out else "ok"
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "source": source,
+            "session_id": session_id,
+            "query_hash": _digest(normalized),
+            "shape_hash": _digest(shape, 12),
+            "duration_s": round(duration_s, 6),
+            "queue_s": None if queue_s is None else round(queue_s, 6),
+            "rows": rows,
+            "cache": None if cache_hit is None else ("hit" if cache_hit else "miss"),
+            "status": status,
+            "error": error,
+            "query": normalized,
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        _file_logger("gpu_ld.queries", QUERY_LOG_PATH).info(line)
+        if duration_s >= SLOW_QUERY_THRESHOLD_S:
+            _file_logger("gpu_ld.slow_queries", SLOW_QUERY_LOG_PATH).info(line)
+        metrics.observe(source, entry["shape_hash"], duration_s, status, cache_hit)
+        write_metrics_file()
+    except Exception:
+        logging.getLogger(__name__).exception("Could not record query")
+
+
+def record_graph_load(seconds):
+    """Counts a (re)load of the RDF graph."""
+    metrics.graph_loaded(seconds)
+    try:
+        write_metrics_file()
+    except OSError:
+        logging.getLogger(__name__).exception("Could not write metrics")
@@ -0,0 +1,66 @@
+from dataclasses import dataclass, field
+import numpy as np
+
+# Numeric product columns (see product_table.py) that get a presorted index
+RANK_COLUMNS = (
+    "fp32GFlops", "tdpWatts", "price", "shadingUnits",
+    "baseClockMHz", "boostClockMHz", "maxClockMHz",
+    "memorySizeKB", "bandwidthMBs", "gflopsPerWatt",
+)
+
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+@dataclass
+class RankIndex:
+    """
+    Per numeric column, the product rows that have a value, sorted ascending
+    by it. A filter then only has to pick rows out of the permutation, the
+    order (and with it top-k, min/max and quantiles) comes for free.
+    """
+    version: str = None
+    # column -> row indices in ascending order of the column's value
+    order: dict = field(default_factory=dict)
+    # column -> the column's values in that same order
+    sorted_values: dict = field(default_factory=dict)
+
+    def select(self, column, mask=None):
+        """Rows matching mask (all when None) in ascending order of column."""
+        order = self.order[column]
+        return order if mask is None else order[mask[order]]
+
+    def top_k(self, column, k, mask=None):
+        """The k rows with the highest values, highest first."""
+        rows = self.select(column, mask)
+        return rows[::-1][:k]
+
+    def quantiles(self, column, percentiles=DEFAULT_PERCENTILES, mask=None):
+        """Percentiles (linear interpolation, as numpy.percentile) of the selected values."""
+        values = self.sorted_values[column] if mask is None else self.sorted_values[column][mask[self.order[column]]]
+        if not len(values):
+            return {p: None for p in percentiles}
+        positions = np.asarray(percentiles, dtype=float) / 100 * (len(values) - 1)
+        lower = np.floor(positions).astype(int)
+        upper = np.minimum(lower + 1, len(values) - 1)
+        result = values[lower] + (values[upper] - values[lower]) * (positions - lower)
+        return dict(zip(percentiles, result.tolist()))
+
+    def min_max(self, column, mask=None):
+        rows = self.select(column, mask)
+        if not len(rows):
+            return None, None
+        return rows[0], rows[-1]
+
+
+def build_rank_index(table, columns=RANK_COLUMNS):
+    """Presorts the numeric columns of a ProductTable (once per graph version)."""
+    index = RankIndex(version=table.version)
+    for column in columns:
+        if column not in table.columns or not table.is_numeric(column):
+            continue
+        values = table.columns[column]
+        rows = np.flatnonzero(~np.isnan(values))
+        order = rows[np.argsort(values[rows], kind="stable")]
+        index.order[column] = order
+        index.sorted_values[column] = values[order]
+    return index
@@ -0,0 +1,178 @@
+"""
+Older dataset releases as named graphs next to the current data.
+
+Each release published by to_rdf.py --release is a TriG file with one named
+graph. The current data stays an ordinary Graph; a release is kept only as
+its difference to it (the triples it adds and the triples it lacks), and a
+read-only store presents the current data as the default graph and every
+release as a named graph of one Dataset. Terms are interned in one
+TermDictionary, so a release holds no second copy of any term either.
+"""
+import gc
+import glob
+import os
+from dataclasses import dataclass, field
+from rdflib import Dataset, Graph, Namespace
+from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+from rdflib.store import Store
+
+EX = Namespace("http://example.org/gpu/")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Same directory as preprocessing/config.py RELEASES_DIR
+RELEASES_DIR = os.path.join(BASE_DIR, "data", "releases")
+
+
+def release_iri(name):
+    return EX[f"release/{name}"]
+
+
+def release_name(iri):
+    return str(iri).rsplit("/", 1)[-1]
+
+
+def release_paths(directory=RELEASES_DIR):
+    return sorted(glob.glob(os.path.join(directory, "*.trig")))
+
+
+class TermDictionary:
+    """One shared object per distinct term; parsers otherwise create a new one per occurrence."""
+
+    def __init__(self):
+        self.terms = {}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def intern(self, term):
+        return self.terms.setdefault(term, term)
+
+
+class InternedGraph(Graph):
+    """A Graph whose added terms go through a TermDictionary."""
+
+    def __init__(self, *args, terms=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.terms = TermDictionary() if terms is None else terms
+
+    def add(self, triple):
+        s, p, o = triple
+        intern = self.terms.intern
+        return super().add((intern(s), intern(p), intern(o)))
+
+
+@dataclass
+class ReleaseDelta:
+    """A release as its difference to the current data."""
+    # triples of the release that the current data does not have
+    added: Graph = None
+    # triples of the current data that the release does not have
+    removed: set = field(default_factory=set)
+
+
+class ReleaseStore(Store):
+    """
+    Read-only store of a Dataset: the default graph is the current data,
+    each release a view of it with its delta applied.
+    """
+    context_aware = True
+    graph_aware = True
+
+    def __init__(self, base):
+        super().__init__()
+        self.base = base
+        # release IRI -> ReleaseDelta
+        self.releases = {}
+
+    def triples(self, pattern, context=None):
+        identifier = getattr(context, "identifier", context)
+        contexts = (context,) if context is not None else ()
+        if identifier is None or identifier == DATASET_DEFAULT_GRAPH_ID:
+            for t, _ in self.base.store.triples(pattern, None):
+                yield t, contexts
+            return
+        delta = self.releases.get(identifier)
+        if delta is None:
+            return
+        removed = delta.removed
+        for t, _ in self.base.store.triples(pattern, None):
+            if t not in removed:
+                yield t, contexts
+        for t in delta.added.triples(pattern):
+            yield t, contexts
+
+    def __len__(self, context=None):
+        delta = self.releases.get(getattr(context, "identifier", context))
+        if delta is None:
+            return len(self.base)
+        return len(self.base) - len(delta.removed) + len(delta.added)
+
+    def _contains(self, delta, triple):
+        return triple in delta.added or (triple not in delta.removed and triple in self.base)
+
+    def contexts(self, triple=None):
+        for identifier, delta in self.releases.items():
+            if triple is None or self._contains(delta, triple):
+                yield Graph(store=self, identifier=identifier)
+
+    def add_graph(self, graph):
+        # Dataset.graph() registers the graphs it hands out; nothing to store
+        pass
+
+    def add(self, triple, context, quoted=False):
+        raise TypeError("Release graphs are read-only.")
+
+    def addN(self, quads):
+        raise TypeError("Release graphs are read-only.")
+
+    def remove(self, triple, context=None):
+        raise TypeError("Release graphs are read-only.")
+
+    # the releases share the namespaces of the current data
+    def bind(self, prefix, namespace, override=True, replace=False):
+        pass
+
+    def namespace(self, prefix):
+        return self.base.store.namespace(prefix)
+
+    def prefix(self, namespace):
+        return self.base.store.prefix(namespace)
+
+    def namespaces(self):
+        return self.base.store.namespaces()
+
+
+def release_delta(g, release, terms):
+    """ReleaseDelta of the release graph against g, with its new terms interned."""
+    intern = terms.intern
+    added = Graph()
+    for s, p, o in release:
+        if (s, p, o) not in g:
+            added.add((intern(s), intern(p), intern(o)))
+    removed = {t for t in g if t not in release}
+    return ReleaseDelta(added=added, removed=removed)
+
+
+def build_release_dataset(g, paths=None):
+    """
+    Dataset over g (the default graph) with every named graph of the release
+    files as a named graph. g should be an InternedGraph so the releases
+    share its terms.
+    """
+    store = ReleaseStore(g)
+    terms = getattr(g, "terms", TermDictionary())
+    for path in release_paths() if paths is None else paths:
+        parsed = Dataset()
+        parsed.parse(path, format="trig")
+        for release in parsed.graphs():
+            if release.identifier != DATASET_DEFAULT_GRAPH_ID and len(release):
+                store.releases[release.identifier] = release_delta(g, release, terms)
+        # the parsed copy is cyclic garbage; free it before parsing the next one
+        parsed = release = None
+        gc.collect()
+    return Dataset(store=store)
+
+
+def release_names(dataset):
+    """Names of the releases of a dataset from build_release_dataset, newest (by name) first."""
+    return sorted((release_name(i) for i in dataset.store.releases), reverse=True)
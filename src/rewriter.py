@@ -0,0 +1,409 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from rdflib import RDF, BNode, URIRef, Variable
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.algebra import BGP, Join, ToMultiSet, Values, _addVars, _traverseAgg
+from rdflib.plugins.sparql.evalutils import _ebv
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import FrozenBindings, QueryContext
+
+# Predicates with at most this many distinct objects keep their object domain,
+# so single-variable filters on them can be pre-evaluated into VALUES blocks
+DOMAIN_LIMIT = 10_000
+
+# Pre-evaluated filters kept in GraphStatistics.filter_cache, oldest dropped first
+FILTER_CACHE_ENTRIES = 128
+
+# Expressions that raise an error (= FILTER false) when one of their variables is unbound
+_STRICT_EXPRESSIONS = {
+    "RelationalExpression", "AdditiveExpression", "MultiplicativeExpression",
+    "Builtin_STR", "Builtin_CONTAINS", "Builtin_STRSTARTS", "Builtin_STRENDS",
+    "Builtin_REGEX", "Builtin_REPLACE", "Builtin_LCASE", "Builtin_UCASE", "Builtin_STRLEN",
+    "Builtin_LANG", "Builtin_DATATYPE",
+}
+
+# Algebra nodes whose graph pattern children are under these keys
+_CHILD_KEYS = ("p", "p1", "p2")
+
+
+@dataclass
+class GraphStatistics:
+    """Per-predicate and per-class counts collected once per loaded graph."""
+    triples: int = 0
+    predicate_count: dict = field(default_factory=dict)
+    distinct_subjects: dict = field(default_factory=dict)
+    distinct_objects: dict = field(default_factory=dict)
+    # predicate -> distinct objects, only for predicates under DOMAIN_LIMIT
+    object_domain: dict = field(default_factory=dict)
+    class_count: dict = field(default_factory=dict)
+    # (class, predicate) -> number of instances of the class having the predicate
+    class_coverage: dict = field(default_factory=dict)
+    # memoized pre-evaluated filters: (predicate, var, conjunct) -> matching objects, at most FILTER_CACHE_ENTRIES
+    filter_cache: dict = field(default_factory=dict)
+
+
+def collect_statistics(g):
+    """Scans the graph once and returns its GraphStatistics."""
+    subjects = defaultdict(set)
+    objects = defaultdict(set)
+    counts = defaultdict(int)
+    for s, p, o in g:
+        counts[p] += 1
+        subjects[p].add(s)
+        objects[p].add(o)
+
+    instances = defaultdict(set)
+    for s, _, c in g.triples((None, RDF.type, None)):
+        instances[c].add(s)
+
+    stats = GraphStatistics(triples=len(g))
+    stats.predicate_count = dict(counts)
+    stats.distinct_subjects = {p: len(v) for p, v in subjects.items()}
+    stats.distinct_objects = {p: len(v) for p, v in objects.items()}
+    stats.object_domain = {p: list(v) for p, v in objects.items() if len(v) <= DOMAIN_LIMIT}
+    stats.class_count = {c: len(v) for c, v in instances.items()}
+    stats.class_coverage = {
+        (c, p): len(inst & subjects[p]) for c, inst in instances.items() for p in subjects
+    }
+    return stats
+
+
+# --- variable analysis ---
+
+def _is_var(term):
+    return isinstance(term, (Variable, BNode))
+
+
+def _triple_vars(triples):
+    return {t for triple in triples for t in triple if _is_var(t)}
+
+
+def _is_true(expr):
+    return expr is None or (isinstance(expr, CompValue) and expr.name == "TrueFilter")
+
+
+def _certain(node):
+    """Variables bound in every solution of a graph pattern."""
+    if not isinstance(node, CompValue):
+        return set()
+    if node.name == "BGP":
+        return _triple_vars(node.triples)
+    if node.name == "Join":
+        return _certain(node.p1) | _certain(node.p2)
+    if node.name in ("LeftJoin", "Minus"):
+        return _certain(node.p1)
+    if node.name in ("Filter", "Extend"):
+        return _certain(node.p)
+    if node.name == "ToMultiSet" and node.p.name == "values":
+        rows = node.p.res
+        return set.intersection(*[{k for k, v in r.items() if v != "UNDEF"} for r in rows]) if rows else set()
+    return set()
+
+
+def _maybe(node, exclude=None):
+    """All variables that may be bound by a pattern (over-approximation)."""
+    if node is exclude:
+        return set()
+    if isinstance(node, (Variable, BNode)):
+        return {node}
+    if isinstance(node, (list, tuple)):
+        return set().union(*[_maybe(x, exclude) for x in node]) if node else set()
+    if isinstance(node, dict):
+        res = set()
+        for k, v in node.items():
+            if isinstance(k, str) and k.startswith("_"):
+                continue
+            res |= _maybe(k, exclude) | _maybe(v, exclude)
+        return res
+    return set()
+
+
+def _strict_vars(expr):
+    """Variables which, when unbound, make the expression an error (filter false)."""
+    if isinstance(expr, Variable):
+        return {expr}
+    if not isinstance(expr, CompValue):
+        return set()
+    if expr.name == "ConditionalAndExpression":
+        return set().union(*[_strict_vars(e) for e in [expr.expr] + list(expr.other or [])])
+    if expr.name == "RelationalExpression" and expr.op in ("IN", "NOT IN"):
+        return _strict_vars(expr.expr)
+    if expr.name not in _STRICT_EXPRESSIONS:
+        return set()
+    res = set()
+    for k, v in expr.items():
+        if k.startswith("_"):
+            continue
+        for item in (v if isinstance(v, list) else [v]):
+            res |= _strict_vars(item)
+    return res
+
+
+def _conjuncts(expr):
+    if isinstance(expr, CompValue) and expr.name == "ConditionalAndExpression":
+        return [expr.expr] + list(expr.other or [])
+    return [expr]
+
+
+def _spine(node):
+    """Graph patterns whose solutions reach the enclosing filter unchanged in number."""
+    yield node
+    if not isinstance(node, CompValue):
+        return
+    if node.name == "Join":
+        yield from _spine(node.p1)
+        yield from _spine(node.p2)
+    elif node.name == "LeftJoin":
+        yield from _spine(node.p1)
+    elif node.name == "Filter":
+        yield from _spine(node.p)
+
+
+# --- rewrite rules ---
+
+def _lazy_join(p1, p2):
+    j = Join(p1, p2)
+    j["lazy"] = True
+    return j
+
+
+def _optional_always_matches(node, stats):
+    """
+    OPTIONAL { ?x <p> ?y } on top of a pattern that types ?x as class C can be
+    evaluated as an inner join when every instance of C has a <p> value.
+    """
+    b = node.p2
+    if not _is_true(node.expr) or b.name != "BGP" or len(b.triples) != 1:
+        return False
+    x, p, y = b.triples[0]
+    if not isinstance(p, URIRef) or not _is_var(y) or y == x or y in _maybe(node.p1):
+        return False
+    if x not in _certain(node.p1):
+        return False
+    for part in _spine(node.p1):
+        if part.name != "BGP":
+            continue
+        for s, tp, c in part.triples:
+            if s == x and tp == RDF.type and isinstance(c, URIRef):
+                total = stats.class_count.get(c, 0)
+                if total and stats.class_coverage.get((c, p), 0) == total:
+                    return True
+    return False
+
+
+def _push_down(p, c):
+    """
+    Returns a pattern equivalent to Join(p, c) with the required pattern c moved
+    below OPTIONALs it does not depend on, and adjacent BGPs merged.
+    """
+    if p.name == "LeftJoin" and _is_true(p.expr) and (_maybe(c) & _maybe(p.p2)) <= _certain(p.p1):
+        p["p1"] = _push_down(p.p1, c)
+        return p
+    if p.name == "BGP" and c.name == "BGP":
+        return BGP(p.triples + c.triples)
+    return _lazy_join(p, c) if c.name == "BGP" else Join(p, c)
+
+
+def _normalize(node, stats):
+    """Bottom-up: OPTIONAL -> join where statistics prove it, then sink required BGPs."""
+    if not isinstance(node, CompValue):
+        return node
+    for key in _CHILD_KEYS:
+        if isinstance(node.get(key), CompValue):
+            node[key] = _normalize(node[key], stats)
+
+    if node.name == "LeftJoin" and _optional_always_matches(node, stats):
+        return _push_down(node.p1, node.p2)
+    if node.name == "Join" and node.p2.name == "BGP" and node.p1.name in ("LeftJoin", "BGP"):
+        return _push_down(node.p1, node.p2)
+    return node
+
+
+def _strengthen(node, strict, root):
+    """
+    Turns OPTIONALs into joins when the enclosing filter needs a variable that
+    only that OPTIONAL can bind: rows without a match are filtered out anyway.
+    """
+    if not isinstance(node, CompValue):
+        return node
+    if node.name == "Join":
+        node["p1"] = _strengthen(node.p1, strict, root)
+        node["p2"] = _strengthen(node.p2, strict, root)
+    elif node.name == "Filter":
+        node["p"] = _strengthen(node.p, strict, root)
+    elif node.name == "LeftJoin":
+        node["p1"] = _strengthen(node.p1, strict, root)
+        b = node.p2
+        if _is_true(node.expr) and b.name == "BGP":
+            needed = (strict & _triple_vars(b.triples)) - _maybe(root, exclude=b)
+            if needed:
+                return _lazy_join(node.p1, b)
+    return node
+
+
+def _matching_objects(stats, predicate, var, conjunct):
+    """Pre-evaluates a single-variable filter over the predicate's object domain."""
+    key = (predicate, var, repr(conjunct))
+    matching = stats.filter_cache.get(key)
+    if matching is None:
+        ctx = QueryContext()
+        matching = [o for o in stats.object_domain[predicate] if _ebv(conjunct, FrozenBindings(ctx, {var: o}))]
+        while len(stats.filter_cache) >= FILTER_CACHE_ENTRIES:
+            stats.filter_cache.pop(next(iter(stats.filter_cache)), None)
+        stats.filter_cache[key] = matching
+    return matching
+
+
+def _insert_values(node, var, values):
+    """Joins a VALUES block right before the BGP that certainly binds var."""
+    if node.name in ("Filter", "Extend") and var in _certain(node.p):
+        node["p"] = _insert_values(node.p, var, values)
+        return node
+    if node.name in ("LeftJoin", "Minus") and var in _certain(node.p1):
+        node["p1"] = _insert_values(node.p1, var, values)
+        return node
+    if node.name == "Join":
+        if var in _certain(node.p1):
+            node["p1"] = _insert_values(node.p1, var, values)
+            return node
+        if var in _certain(node.p2):
+            node["p2"] = _insert_values(node.p2, var, values)
+            return node
+    return _lazy_join(values, node)
+
+
+def _pushdown_filter(node, stats):
+    """
+    FILTER(f(?v)) where ?v is bound by a required (?s <p> ?v) becomes a VALUES
+    block of exactly those <p> objects for which f holds. The filter is kept, so
+    results are unchanged, but ?v is now bound before the pattern is scanned.
+    """
+    x = node.p
+    certain = _certain(x)
+    required = [t for part in _spine(x) if part.name == "BGP" for t in part.triples]
+    for conjunct in _conjuncts(node.expr):
+        used = _maybe(conjunct)
+        if len(used) != 1:
+            continue
+        var = next(iter(used))
+        if var not in certain or var not in _strict_vars(conjunct):
+            continue
+        predicate = next((p for s, p, o in required if o == var and p in stats.object_domain), None)
+        if predicate is None:
+            continue
+        matching = _matching_objects(stats, predicate, var, conjunct)
+        values = ToMultiSet(Values([{var: o} for o in matching]))
+        x = _insert_values(x, var, values)
+    node["p"] = x
+    return node
+
+
+def _rewrite_filters(node, stats):
+    if not isinstance(node, CompValue):
+        return node
+    for key in _CHILD_KEYS:
+        if isinstance(node.get(key), CompValue):
+            node[key] = _rewrite_filters(node[key], stats)
+    if node.name == "Filter":
+        node["p"] = _normalize(_strengthen(node.p, _strict_vars(node.expr), node.p), stats)
+        node = _pushdown_filter(node, stats)
+    return node
+
+
+# --- selectivity ordering ---
+
+def _estimate(stats, triple, bound):
+    s, p, o = triple
+    s_bound = not _is_var(s) or s in bound
+    o_bound = not _is_var(o) or o in bound
+    if _is_var(p) and p not in bound:
+        n = stats.triples
+        return 1 if s_bound and o_bound else n / 10 if s_bound or o_bound else n
+    if p == RDF.type and not _is_var(o) and not s_bound:
+        return stats.class_count.get(o, 0)
+    n = stats.predicate_count.get(p, 0)
+    if s_bound and o_bound:
+        return min(1, n)
+    if s_bound:
+        return n / max(1, stats.distinct_subjects.get(p, 1))
+    if o_bound:
+        return n / max(1, stats.distinct_objects.get(p, 1))
+    return n
+
+
+def _order_bgp(triples, bound, stats):
+    """Greedy join order: cheapest pattern first, preferring connected patterns."""
+    remaining = list(triples)
+    ordered = []
+    bound = set(bound)
+    while remaining:
+        best = min(
+            remaining,
+            key=lambda t: (
+                bool(bound) and not (_triple_vars([t]) & bound) and bool(_triple_vars([t])),
+                _estimate(stats, t, bound),
+            ),
+        )
+        remaining.remove(best)
+        ordered.append(best)
+        bound |= _triple_vars([best])
+    return ordered
+
+
+def _order(node, bound, stats):
+    """
+    Orders every BGP for the variables bound when it is evaluated. Where needed,
+    a BGP becomes a chain of lazy joins, which rdflib evaluates in exactly this order.
+    """
+    if not isinstance(node, CompValue):
+        return node
+    if node.name == "BGP":
+        if len(node.triples) < 2:
+            return node
+        ordered = _order_bgp(node.triples, bound, stats)
+        # rdflib stable-sorts a BGP by the number of unbound terms at its start;
+        # only when that would break our order is a join chain needed
+        unbound = lambda t: sum(1 for x in t if _is_var(x) and x not in bound)
+        if sorted(ordered, key=unbound) == ordered:
+            return BGP(ordered)
+        chain = BGP([ordered[0]])
+        for t in ordered[1:]:
+            chain = _lazy_join(chain, BGP([t]))
+        return chain
+    if node.name == "Join":
+        node["p1"] = _order(node.p1, bound, stats)
+        node["p2"] = _order(node.p2, bound | _certain(node.p1) if node.lazy else bound, stats)
+    elif node.name == "LeftJoin":
+        node["p1"] = _order(node.p1, bound, stats)
+        node["p2"] = _order(node.p2, bound | _certain(node.p1), stats)
+    else:
+        for key in _CHILD_KEYS:
+            if isinstance(node.get(key), CompValue):
+                node[key] = _order(node[key], bound, stats)
+    return node
+
+
+def _uses_other_graphs(node):
+    if not isinstance(node, CompValue):
+        return False
+    return node.name in ("Graph", "ServiceGraphPattern") or any(_uses_other_graphs(node.get(key)) for key in _CHILD_KEYS)
+
+
+def rewrite_query(prepared, stats):
+    """Rewrites the algebra of a prepared query in place and returns it."""
+    algebra = prepared.algebra
+    # the statistics describe the default graph only; pre-evaluated filters would be wrong
+    # for releases and remote (SERVICE) data
+    if _uses_other_graphs(algebra.p):
+        return prepared
+    algebra["p"] = _order(_rewrite_filters(_normalize(algebra.p, stats), stats), set(), stats)
+    _traverseAgg(algebra, _addVars)
+    return prepared
+
+
+def optimized_query(g, query, stats):
+    """Prepares a query string for g and, when statistics are given, rewrites it."""
+    prepared = prepareQuery(query, initNs=dict(g.namespaces()))
+    if stats is None or prepared.algebra.p is None:
+        return prepared
+    return rewrite_query(prepared, stats)
@@ -0,0 +1,176 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Queries evaluated at the same time across all sessions
+MAX_CONCURRENT = 4
+# Per-session quotas: queries running at once and queries waiting in line
+SESSION_MAX_RUNNING = 1
+SESSION_MAX_QUEUED = 2
+
+# Lanes in priority order. The encyclopedia is served from the product table
+# and no longer queries, so the console is the only lane left.
+LANES = ("console",)
+
+POLL_INTERVAL_S = 0.1
+
+
+class QuotaExceeded(Exception):
+    """The session already has as many queries waiting as it may."""
+
+
+@dataclass
+class LaneMetrics:
+    admitted: int = 0
+    rejected: int = 0
+    queue_s: float = 0.0
+    max_queue_s: float = 0.0
+    run_s: float = 0.0
+    max_run_s: float = 0.0
+
+
+@dataclass
+class _Ticket:
+    seq: int
+    session_id: str
+    lane: str
+    enqueued: float = field(default_factory=time.monotonic)
+    admitted: bool = False
+
+
+class QueryScheduler:
+    """
+    Admission control shared by all sessions of the app. Queries wait in one
+    queue ordered by lane, then round-robin over sessions; the first waiting
+    query whose session is under its quota is admitted whenever a slot frees.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT,
+                 session_max_running=SESSION_MAX_RUNNING, session_max_queued=SESSION_MAX_QUEUED):
+        self.max_concurrent = max_concurrent
+        self.session_max_running = session_max_running
+        self.session_max_queued = session_max_queued
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._queue = []
+        self._running = {}
+        # session id -> admission counter value of its latest admitted query
+        self._served = {}
+        self._admissions = itertools.count()
+        self._metrics = {lane: LaneMetrics() for lane in LANES}
+
+    def _order(self):
+        """
+        Waiting tickets in admission order: by lane, then round-robin over
+        sessions (a session's second query goes after everyone's first one,
+        the session served longest ago first), then by arrival.
+        """
+        rank, seen = {}, {}
+        for t in sorted(self._queue, key=lambda t: t.seq):
+            rank[t.seq] = seen.get((t.lane, t.session_id), 0)
+            seen[(t.lane, t.session_id)] = rank[t.seq] + 1
+        return sorted(self._queue, key=lambda t: (LANES.index(t.lane), rank[t.seq],
+                                                  self._served.get(t.session_id, -1), t.seq))
+
+    def _admit(self):
+        """Admits waiting tickets in priority order while there are free slots."""
+        running = sum(self._running.values())
+        for ticket in self._order():
+            if running >= self.max_concurrent:
+                break
+            if self._running.get(ticket.session_id, 0) >= self.session_max_running:
+                continue
+            ticket.admitted = True
+            self._served[ticket.session_id] = next(self._admissions)
+            self._queue.remove(ticket)
+            self._running[ticket.session_id] = self._running.get(ticket.session_id, 0) + 1
+            running += 1
+        self._cond.notify_all()
+
+    def position(self, ticket):
+        """1-based place of a waiting ticket in the admission order."""
+        order = self._order()
+        return order.index(ticket) + 1 if ticket in order else 0
+
+    @contextmanager
+    def slot(self, session_id, lane="console", on_wait=None):
+        """
+        Holds one evaluation slot for the duration of the with-block.
+
+        on_wait(position, queued, waited_s) is called while the query waits,
+        which also lets Streamlit stop the script (the ticket is dropped).
+        Raises QuotaExceeded when the session already has too many queries
+        waiting.
+        """
+        metrics = self._metrics[lane]
+        with self._cond:
+            waiting = sum(1 for t in self._queue if t.session_id == session_id)
+            if waiting >= self.session_max_queued:
+                metrics.rejected += 1
+                raise QuotaExceeded(f"Too many queries waiting for this session (limit {self.session_max_queued}).")
+            ticket = _Ticket(next(self._seq), session_id, lane)
+            self._queue.append(ticket)
+            self._admit()
+
+        try:
+            while True:
+                with self._cond:
+                    if not ticket.admitted:
+                        self._cond.wait(POLL_INTERVAL_S)
+                    if ticket.admitted:
+                        break
+                    position, queued = self.position(ticket), len(self._queue)
+                if on_wait:
+                    on_wait(position, queued, time.monotonic() - ticket.enqueued)
+        except BaseException:
+            with self._cond:
+                if ticket.admitted:
+                    self._release(ticket.session_id)
+                else:
+                    self._queue.remove(ticket)
+                    self._admit()
+            raise
+
+        started = time.monotonic()
+        queue_s = started - ticket.enqueued
+        try:
+            yield queue_s
+        finally:
+            run_s = time.monotonic() - started
+            with self._cond:
+                metrics.admitted += 1
+                metrics.queue_s += queue_s
+                metrics.max_queue_s = max(metrics.max_queue_s, queue_s)
+                metrics.run_s += run_s
+                metrics.max_run_s = max(metrics.max_run_s, run_s)
+                self._release(ticket.session_id)
+
+    def _release(self, session_id):
+        self._running[session_id] -= 1
+        if not self._running[session_id]:
+            del self._running[session_id]
+        self._admit()
+
+    def snapshot(self):
+        """Current load and per-lane metrics as plain data."""
+        with self._cond:
+            return {
+                "running": sum(self._running.values()),
+                "queued": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "lanes": {lane: LaneMetrics(**vars(m)) for lane, m in self._metrics.items()},
+            }
+
+
+# One scheduler per server process, in front of every query from the UI
+scheduler = QueryScheduler()
+
+
+def current_session_id():
+    """Id of the Streamlit session running this script ("local" outside Streamlit)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else "local"
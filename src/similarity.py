@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+import numpy as np
+
+# Product table column -> compared on a log scale (heavy-tailed quantities)
+SIMILARITY_COLUMNS = {
+    "shadingUnits": True,
+    "maxClockMHz": True,
+    "memorySizeKB": True,
+    "memoryBusSort": True,
+    "bandwidthMBs": True,
+    "fp32GFlops": True,
+    "tdpWatts": True,
+    "price": True,
+    "releaseYear": False,
+}
+
+# Candidates must share at least this many known properties with the query card
+MIN_SHARED = 3
+DEFAULT_K = 10
+
+
+@dataclass
+class SimilarityIndex:
+    """
+    Standardized spec vectors of all products with the terms of the
+    masked squared distance precomputed, so a query is one
+    (rows x properties) @ (properties x 3) product. Missing properties are
+    left out of a comparison; the distance over the shared ones is scaled
+    up to the full dimension so cards with few known specs do not look
+    closer than they are.
+    """
+    version: str = None
+    columns: tuple = ()
+    # standardized values (0 where missing) and presence mask, rows x columns
+    values: np.ndarray = None
+    present: np.ndarray = None
+    # per row and column: present * value ** 2, present * value, present
+    terms: np.ndarray = field(default=None, repr=False)
+
+    def distances(self, rows):
+        """Distance of every product to each of the query rows (rows x products, inf when not comparable)."""
+        q_present = self.present[rows]
+        q_values = self.values[rows]
+        # sum_j p_ij * m_j * (x_ij - q_j)^2 = (p x^2) m - 2 (p x) (m q) + p (m q^2)
+        weights = np.concatenate([q_present, -2 * q_present * q_values, q_present * q_values ** 2], axis=1)
+        squared = self.terms @ weights.T
+        shared = self.present.astype(float) @ q_present.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scaled = np.maximum(squared, 0) * len(self.columns) / shared
+        scaled[shared < MIN_SHARED] = np.inf
+        return np.sqrt(scaled).T
+
+    def nearest(self, row, k=DEFAULT_K):
+        """The k products closest to row (itself excluded) as [(row, distance)], closest first."""
+        return self.nearest_batch([row], k)[0]
+
+    def nearest_batch(self, rows, k=DEFAULT_K):
+        """nearest() for several rows with one matrix product."""
+        dist = self.distances(np.asarray(rows))
+        dist[np.arange(len(rows)), rows] = np.inf
+        k = min(k, dist.shape[1] - 1)
+        candidates = np.argpartition(dist, k, axis=1)[:, :k]
+        result = []
+        for i, cand in enumerate(candidates):
+            cand = cand[np.argsort(dist[i, cand], kind="stable")]
+            result.append([(int(r), float(dist[i, r])) for r in cand if np.isfinite(dist[i, r])])
+        return result
+
+
+def build_similarity_index(table, columns=SIMILARITY_COLUMNS):
+    """Standardizes the spec columns of a ProductTable (once per graph version)."""
+    names = tuple(c for c in columns if c in table.columns)
+    raw = np.column_stack([table.columns[c] for c in names])
+    logs = np.array([columns[c] for c in names])
+    # non-positive values cannot go on a log scale and count as missing
+    raw[:, logs] = np.log(np.where(raw[:, logs] > 0, raw[:, logs], np.nan))
+    present = ~np.isnan(raw)
+    mean = np.nanmean(raw, axis=0)
+    std = np.nanstd(raw, axis=0)
+    values = np.where(present, (raw - mean) / np.where(std > 0, std, 1), 0.0)
+    p = present.astype(float)
+    return SimilarityIndex(
+        version=table.version,
+        columns=names,
+        values=values,
+        present=present,
+        terms=np.concatenate([p * values ** 2, p * values, p], axis=1),
+    )
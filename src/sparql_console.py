@@ -1,57 +1,247 @@
-import json
+import functools
+import time
 import streamlit as st
 import pandas as pd
+from src.query_exec import run_query, run_in_worker, paginate_query, DEFAULT_TIMEOUT_S, DEFAULT_MAX_ROWS, DEFAULT_PAGE_SIZE
+from src.exporters import EXPORT_FORMATS, EXPORT_MAX_ROWS, formats_for, export_bytes
+from src.profiler import profile_query
+from src.scheduler import scheduler, current_session_id, QuotaExceeded
+from src.query_log import record_query
+from src.queries import CONSOLE_TEMPLATES
+# registers the batched SERVICE evaluation for all queries of the app
+from src import federation
 
-def show_console(g):
+def show_queue_position(placeholder):
+    def update(position, queued, waited_s):
+        placeholder.caption(f"Waiting for a free query slot... position {position} of {queued} ({waited_s:.1f} s)")
+    return update
+
+
+def show_scheduler_status():
+    """Current load of the shared query scheduler and its per-lane metrics."""
+    snap = scheduler.snapshot()
+    st.caption(f"{snap['running']} of {snap['max_concurrent']} query slots in use, {snap['queued']} queries waiting.")
+    rows = []
+    for lane, m in snap["lanes"].items():
+        rows.append({
+            "lane": lane,
+            "admitted": m.admitted,
+            "rejected": m.rejected,
+            "avg queue (s)": m.queue_s / m.admitted if m.admitted else 0.0,
+            "max queue (s)": m.max_queue_s,
+            "avg run (s)": m.run_s / m.admitted if m.admitted else 0.0,
+            "max run (s)": m.max_run_s,
+        })
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+
+def show_federation_status():
+    """Endpoints SERVICE may call and the state of their result cache."""
+    client = federation.client()
+    st.caption(f"Allowed endpoints: {', '.join(client.endpoints) or 'none'} (GPU_LD_SERVICE_ENDPOINTS). "
+               f"Bind-joins send {client.batch_size} keys per request, {client.max_concurrency} requests in parallel; "
+               f"answers are cached for {client.cache.ttl_s:g} s.")
+    rows = client.cache.stats()
+    if rows:
+        st.dataframe(pd.DataFrame(rows, columns=["endpoint", "cached keys", "expired keys"]), hide_index=True)
+        if st.button("Clear SERVICE cache"):
+            client.cache.clear()
+            st.rerun()
+
+
+def show_profile(g, query, timeout_s, stats=None):
+    """Runs the query under the profiler and shows the algebra tree with timings."""
+    waiting = st.empty()
+    try:
+        with scheduler.slot(current_session_id(), "console", on_wait=show_queue_position(waiting)) as queue_s:
+            waiting.empty()
+            with st.spinner("Profiling query..."):
+                start = time.monotonic()
+                profile, error, timed_out = run_in_worker(profile_query, (g, query, None, stats), timeout_s=timeout_s)
+        record_query("console-profile", query, time.monotonic() - start,
+                     rows=profile.result_rows if profile else None, session_id=current_session_id(),
+                     queue_s=queue_s, error=error, timed_out=timed_out)
+    except QuotaExceeded as e:
+        waiting.empty()
+        st.warning(str(e))
+        return
+
+    if timed_out:
+        st.warning(f"Profiling timed out after {timeout_s:g} s and was stopped.")
+        return
+    if error:
+        st.error(f"Error in query: {error}")
+        return
+
+    st.write("### Query profile")
+    cols = st.columns(5)
+    cols[0].metric("Parse", f"{profile.parse_s * 1000:.1f} ms")
+    cols[1].metric("Translate", f"{profile.translate_s * 1000:.1f} ms")
+    cols[2].metric("Rewrite", f"{profile.rewrite_s * 1000:.1f} ms")
+    cols[3].metric("Evaluate", f"{profile.evaluate_s * 1000:.1f} ms")
+    cols[4].metric("Result rows", profile.result_rows)
+
+    ops = pd.DataFrame(profile.operators)
+    ops["operator"] = [("\u00a0\u00a0" * d) + name for d, name in zip(ops["depth"], ops["operator"])]
+    st.dataframe(
+        ops[["operator", "detail", "calls", "rows", "total_ms", "self_ms"]],
+        use_container_width=True,
+        column_config={
+            "total_ms": st.column_config.NumberColumn("total (ms)", format="%.2f"),
+            "self_ms": st.column_config.NumberColumn("self (ms)", format="%.2f"),
+        }
+    )
+    with st.expander("Algebra tree (text)"):
+        st.code(profile.explain(), language=None)
+
+
+def show_console(g, stats=None, version=None):
     st.subheader("SPARQL Endpoint")
     st.write("manually run SPARQL queries against the database.")
 
-    # Predefined query templates
-    templates = {
-        "All GPUs made by NVIDIA": "SELECT ?gpu ?name ?year WHERE {\n?gpu <https://schema.org/manufacturer> <http://example.org/gpu/NVIDIA> ;\n<https://schema.org/name> ?name ;\n<http://example.org/gpu/releaseYear> ?year.}",
-        "Top 10 GPUs by TDP": "SELECT ?name ?tdp WHERE {\n  ?gpu <http://example.org/gpu/tdpWatts> ?tdp ;\n       <https://schema.org/name> ?name .\n} ORDER BY DESC(?tdp) LIMIT 10",
-        "Count of GPUs by year": "SELECT ?year (COUNT(?gpu) AS ?count) WHERE {\n  ?gpu <http://example.org/gpu/releaseYear> ?year .\n} GROUP BY ?year ORDER BY ?year",
-        "Show all custom made predicates":"SELECT ?label ?iri ?range ?comment WHERE {\n?iri a <http://www.w3.org/1999/02/22-rdf-syntax-ns#Property>;\n<http://www.w3.org/2000/01/rdf-schema#comment> ?comment;\n<http://www.w3.org/2000/01/rdf-schema#range> ?range;\n<http://www.w3.org/2000/01/rdf-schema#label> ?label.}",
-        "Show all used predicates":"SELECT DISTINCT ?p WHERE {\n  ?s ?p ?o .\n}",
-        "Custom query":"# Write your custom SPARQL query here"
-    }
-
-    selected_template = st.selectbox("preset query selection:", list(templates.keys()))
+    selected_template = st.selectbox("preset query selection:", list(CONSOLE_TEMPLATES))
     
-    query_input = st.text_area("SPARQL query:", templates[selected_template], height=200)
-
-    if st.button("Run Query"):
-        try:
-            results = g.query(query_input)
-            
-            res_list = []
-            for row in results:
-                res_list.append({str(k): (v.toPython() if hasattr(v, 'toPython') else str(v)) for k, v in row.asdict().items()})
-                
-            if res_list:
-                df_res = pd.DataFrame(res_list)
-                
-                st.success(f"Query successful! Found {len(df_res)} results.")
-                st.dataframe(df_res, use_container_width=True)
-
-                json_ld_data = {
-                    "@context": {
-                        "name": "https://schema.org/name",
-                        "manufacturer": "https://schema.org/manufacturer",
-                        "tdp": "http://example.org/gpu/tdpWatts",
-                        "year": "http://example.org/gpu/releaseYear",
-                        "gpu": "@id"
-                    },
-                    "@graph": res_list
-                }
-
-                st.download_button(
-                    "Download results as JSON-LD",
-                    json.dumps(json_ld_data, indent=2),
-                    "results.jsonld",
-                    "application/ld+json"
-                )
+    query_input = st.text_area("SPARQL query:", CONSOLE_TEMPLATES[selected_template], height=200)
+
+    with st.expander("Execution limits"):
+        col_l1, col_l2 = st.columns(2)
+        timeout_s = col_l1.number_input("Timeout (seconds):", min_value=1.0, max_value=600.0, value=DEFAULT_TIMEOUT_S, step=5.0)
+        page_size = int(col_l2.number_input("Rows per page:", min_value=1, max_value=DEFAULT_MAX_ROWS, value=DEFAULT_PAGE_SIZE, step=50))
+        use_rewriter = st.checkbox("Optimize with graph statistics (join order, FILTER pushdown)", value=stats is not None,
+                                   disabled=stats is None)
+    query_stats = stats if use_rewriter else None
+
+    with st.expander("Query scheduler"):
+        show_scheduler_status()
+
+    with st.expander("Federated SERVICE"):
+        show_federation_status()
+
+    session_id = current_session_id()
+
+    def show_progress(placeholder):
+        def update(elapsed, n_rows):
+            placeholder.caption(f"Running... {elapsed:.1f} s, {n_rows} rows received")
+        return update
+
+    col_b1, col_b2 = st.columns([1, 5])
+    if col_b1.button("Run Query"):
+        st.session_state.console_query = query_input
+        st.session_state.console_page = 0
+        st.session_state.console_count = None
+        st.session_state.console_result = None
+
+    if col_b2.button("Explain / Profile"):
+        show_profile(g, query_input, timeout_s, query_stats)
+        return
+
+    active_query = st.session_state.get("console_query")
+    if active_query is None:
+        return
+
+    def change_page(step):
+        st.session_state.console_page = max(0, st.session_state.console_page + step)
+
+    page = st.session_state.console_page
+    offset = page * page_size
+
+    try:
+        # other widgets rerun the script too; the page is only evaluated again when it changes
+        page_key = (active_query, offset, page_size, version)
+        cached = st.session_state.get("console_result")
+        if cached is not None and cached[0] == page_key:
+            _, outcome, is_paged = cached
+        else:
+            # one row past the page tells us whether a next page exists. The query is paged
+            # and rewritten in the worker: pre-evaluating filters can take as long as the query.
+            prepare = functools.partial(paginate_query, g, active_query, offset, page_size + 1, query_stats)
+
+            progress = st.empty()
+            with scheduler.slot(session_id, "console", on_wait=show_queue_position(progress)) as queue_s:
+                outcome = run_query(g, prepare, timeout_s=timeout_s, max_rows=DEFAULT_MAX_ROWS,
+                                    on_progress=show_progress(progress))
+            progress.empty()
+            # only SELECT queries are paged (paginate_query)
+            is_paged = outcome.kind == "SELECT"
+            record_query("console", active_query, outcome.elapsed,
+                         rows=min(len(outcome.rows), page_size) if is_paged else len(outcome.rows),
+                         session_id=session_id, queue_s=queue_s, error=outcome.error, timed_out=outcome.timed_out)
+            st.session_state.console_result = (page_key, outcome, is_paged)
+
+        if outcome.error:
+            raise Exception(outcome.error)
+        if outcome.timed_out:
+            st.warning(f"Query timed out after {timeout_s:g} s and was stopped. "
+                       f"Showing the {len(outcome.rows)} rows received before the limit.")
+        elif outcome.truncated and not is_paged:
+            st.warning(f"Result truncated to the first {DEFAULT_MAX_ROWS} rows.")
+
+        if outcome.kind == "ASK":
+            st.success(f"Query successful! Answer: {outcome.ask}")
+            return
+
+        has_next = is_paged and len(outcome.rows) > page_size
+        page_rows = outcome.rows[:page_size] if is_paged else outcome.rows
+
+        # only the visible page is converted to Python values
+        res_list = []
+        for row in page_rows:
+            res_list.append({k: (v.toPython() if hasattr(v, 'toPython') else str(v)) for k, v in zip(outcome.vars, row) if v is not None})
+
+        if res_list:
+            df_res = pd.DataFrame(res_list)
+
+            if is_paged:
+                total = st.session_state.console_count
+                total_text = f"{total}" if total is not None else "unknown"
+                st.success(f"Query successful! Showing results {offset + 1}-{offset + len(res_list)} (total: {total_text}).")
             else:
-                st.info("No results returned.")
-        except Exception as e:
-            st.error(f"Error in query: {e}")
\ No newline at end of file
+                st.success(f"Query successful! Found {len(df_res)} results.")
+            st.dataframe(df_res, use_container_width=True)
+
+            if is_paged:
+                col_p1, col_p2, col_p3 = st.columns([1, 1, 4])
+                col_p1.button("Previous page", on_click=change_page, args=(-1,), disabled=page == 0)
+                col_p2.button("Next page", on_click=change_page, args=(1,), disabled=not has_next)
+                if col_p3.button("Count all results", disabled=st.session_state.console_count is not None):
+                    counting = st.empty()
+                    with scheduler.slot(session_id, "console", on_wait=show_queue_position(counting)) as queue_s:
+                        counted = run_query(g, active_query, timeout_s=timeout_s, count_only=True,
+                                            on_progress=show_progress(counting))
+                    record_query("console-count", active_query, counted.elapsed, rows=counted.count,
+                                 session_id=session_id, queue_s=queue_s, error=counted.error,
+                                 timed_out=counted.timed_out)
+                    counting.empty()
+                    if counted.count is not None:
+                        st.session_state.console_count = counted.count
+                        st.rerun()
+                    st.warning("Counting timed out." if counted.timed_out else f"Counting failed: {counted.error}")
+
+            st.write("Export full result:")
+            st.caption(f"The file is written when you click the button and held in memory while it downloads; "
+                       f"exports stop with an error after the timeout or {EXPORT_MAX_ROWS:,} rows.")
+            col_e1, col_e2 = st.columns([1, 3])
+            export_fmt = col_e1.selectbox("Format:", formats_for(outcome.kind), label_visibility="collapsed")
+            file_name, mime = EXPORT_FORMATS[export_fmt][:2]
+            def export():
+                # the export is only evaluated and written out when the button is clicked
+                with scheduler.slot(session_id, "console") as queue_s:
+                    start = time.monotonic()
+                    try:
+                        return export_bytes(g, active_query, export_fmt, timeout_s=timeout_s)
+                    finally:
+                        record_query("console-export", active_query, time.monotonic() - start,
+                                     session_id=session_id, queue_s=queue_s)
+
+            col_e2.download_button(
+                f"Download as {export_fmt}",
+                export,
+                file_name,
+                mime
+            )
+        else:
+            st.info("No results returned.")
+    except QuotaExceeded as e:
+        st.warning(str(e))
+    except Exception as e:
+        st.error(f"Error in query: {e}")
\ No newline at end of file
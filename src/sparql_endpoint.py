@@ -0,0 +1,143 @@
+"""
+A minimal SPARQL 1.1 Protocol endpoint (SELECT / ASK, JSON results) over a
+Turtle file, as a local stand-in for the inventory and pricing service when
+developing and testing federated SERVICE queries (src.federation).
+
+    python -m src.sparql_endpoint [DATA.ttl] [--port 3031] [--latency-ms 0]
+
+Without a file it serves synthetic inventory data for the products of the
+GPU graph. --latency-ms delays every response, to stand in for the network.
+"""
+import argparse
+import http.server
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from rdflib import Graph, Literal, Namespace, RDF, XSD
+from src.batch_runner import DATA_PATHS, load_graph
+
+SCHEMA = Namespace("https://schema.org/")
+INV = Namespace("http://example.org/inventory/")
+
+DEFAULT_PORT = 3031
+PATH = "/sparql"
+DEFAULT_URL = f"http://127.0.0.1:{DEFAULT_PORT}{PATH}"
+WAREHOUSES = ["Berlin", "Rotterdam", "Austin", "Taipei", "Singapore"]
+# Share of the products the synthetic inventory knows about
+STOCKED_SHARE = 0.85
+
+
+def synthetic_inventory(g, seed=0):
+    """Stock level, warehouse and list price for most products of g; the same for the same seed."""
+    rng = random.Random(seed)
+    inventory = Graph()
+    inventory.bind("inv", INV)
+    for product in sorted(g.subjects(RDF.type, SCHEMA.Product)):
+        if rng.random() > STOCKED_SHARE:
+            continue
+        inventory.add((product, INV.stock, Literal(rng.randint(0, 40), datatype=XSD.integer)))
+        inventory.add((product, INV.warehouse, Literal(rng.choice(WAREHOUSES))))
+        launch = g.value(product, SCHEMA.price)
+        price = int(launch) * rng.uniform(0.6, 1.1) if launch is not None else rng.uniform(50, 2000)
+        inventory.add((product, INV.listPrice, Literal(f"{price:.2f}", datatype=XSD.decimal)))
+    return inventory
+
+
+class _EndpointHandler(http.server.BaseHTTPRequestHandler):
+    # keep-alive, so clients can reuse their connections
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._answer(url.path, parse_qs(url.query).get("query", [None])[0])
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        if self.headers.get("Content-Type", "").startswith("application/sparql-query"):
+            query = body
+        else:
+            query = parse_qs(body).get("query", [None])[0]
+        self._answer(urlparse(self.path).path, query)
+
+    def _answer(self, path, query):
+        with self.server.lock:
+            self.server.requests += 1
+        if path != PATH:
+            self._send(404, b"Not found", "text/plain")
+            return
+        if not query:
+            self._send(400, b"Missing query", "text/plain")
+            return
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+        try:
+            # rdflib's query parser is not thread-safe; the latency above still overlaps
+            with self.server.query_lock:
+                body = self.server.graph.query(query).serialize(format="json")
+        except Exception as e:
+            self._send(400, f"{type(e).__name__}: {e}".encode("utf-8"), "text/plain")
+            return
+        self._send(200, body, "application/sparql-results+json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(graph, port=DEFAULT_PORT, latency_s=0.0):
+    """
+    Serves graph on http://127.0.0.1:<port>/sparql in a daemon thread and
+    returns the server; port 0 picks a free port (server.server_port).
+    server.requests and server.connections count what the clients did.
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _EndpointHandler)
+    server.daemon_threads = True
+    server.graph = graph
+    server.latency_s = latency_s
+    server.lock = threading.Lock()
+    server.query_lock = threading.Lock()
+    server.requests = 0
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def endpoint_url(server):
+    return f"http://127.0.0.1:{server.server_port}{PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("data", nargs="?", help="Turtle file to serve (default: synthetic inventory)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every response")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic inventory")
+    args = parser.parse_args()
+
+    if args.data:
+        graph = Graph()
+        graph.parse(args.data, format="turtle")
+    else:
+        graph = synthetic_inventory(load_graph(DATA_PATHS), args.seed)
+    server = serve(graph, args.port, args.latency_ms / 1000)
+    print(f"serving {len(graph):,} triples on {endpoint_url(server)}, Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,229 @@
+import time
 import streamlit as st
+import numpy as np
 import pandas as pd
-from rdflib import Graph, URIRef
+from src.scheduler import current_session_id
+from src.query_log import record_query
+from src.product_table import build_product_table
+from src.rank_index import build_rank_index, DEFAULT_PERCENTILES
+from src.name_search import build_name_search
+from src.bitmap_index import build_bitmap_index, range_bits, unpack
+from src.similarity import build_similarity_index
+from src.entity_pages import entity_url
+from src.queries import RANK_CRITERIA, build_facet_query
 
-def show_wiki(g, EX, SCHEMA):
+# Filter -> label of its value dropdown
+FACET_PROMPTS = {
+    "Brand": "Select brand:",
+    "Architecture": "Select architecture:",
+    "Release Year": "Select year:",
+    "Memory Size": "Select VRAM:",
+    "Memory Type": "Select memory type:",
+    "Memory Bus": "Select bus width:",
+}
+
+# Range slider -> (product table column, column units per slider unit)
+RANGE_FILTERS = {
+    "Release year": ("releaseYear", 1),
+    "TDP (W)": ("tdpWatts", 1),
+    "Memory (GB)": ("memorySizeKB", 1024 ** 2),
+}
+
+# Result table column -> product table column
+TABLE_COLUMNS = {
+    "Name": "name",
+    "GPU": "gpuName",
+    "Brand": "manufacturer",
+    "Architecture": "hasArchitecture",
+    "Year": "releaseYear",
+    "Memory type": "memoryType",
+    "Memory (KB)": "memorySizeKB",
+    "TDP (W)": "tdpWatts",
+    "GFLOPS": "fp32GFlops",
+    "Price ($)": "price",
+}
+DEFAULT_TABLE_COLUMNS = ["Name", "Year"]
+PAGE_SIZES = (25, 50, 100, 250)
+
+def show_name_search(products, name_search):
+    """Search box with ranked, typo-tolerant matches on product, GPU and codenames."""
+    query = st.text_input("Find a card by name:", placeholder="e.g. RTX 4090, Navi 31, voodoo3")
+    if not query.strip():
+        return
+
+    t = time.perf_counter()
+    matches = name_search.search(query)
+    elapsed = time.perf_counter() - t
+    if not matches:
+        st.info("No matching cards.")
+        return
+
+    rows = [row for row, _ in matches]
+    st.dataframe(pd.DataFrame({
+        "Name": products.columns["name"][rows],
+        "GPU": products.columns["gpuName"][rows],
+        "Codename": products.columns["gpuCodename"][rows],
+        "Brand": products.columns["manufacturer"][rows],
+        "Year": pd.array(products.columns["releaseYear"][rows], dtype="Int64"),
+        "Match": [score for _, score in matches],
+    }), use_container_width=True, hide_index=True,
+        column_config={"Match": st.column_config.ProgressColumn("Match", min_value=0.0, max_value=1.0, format="%.2f")})
+    st.caption(f"{len(matches)} best matches in {elapsed * 1000:.2f} ms.")
+
+
+def show_similar(products, similarity):
+    """Nearest neighbours of one card in the standardized spec space."""
+    names = products.columns["name"]
+    row = st.selectbox("Find cards similar to:", range(len(products)), index=None,
+                       format_func=lambda r: f"{names[r]} ({products.columns['manufacturer'][r]})",
+                       placeholder="Pick a card")
+    if row is None:
+        return
+
+    t = time.perf_counter()
+    matches = similarity.nearest(row)
+    elapsed = time.perf_counter() - t
+    if not matches:
+        st.info("Too few known specs to compare this card.")
+        return
+
+    rows = [r for r, _ in matches]
+    frame = _page_frame(products, rows, {"Name": "name", "Brand": "manufacturer", "Year": "releaseYear",
+                                         "GFLOPS": "fp32GFlops", "Memory (KB)": "memorySizeKB", "TDP (W)": "tdpWatts"})
+    frame["Distance"] = [distance for _, distance in matches]
+    frame["Details"] = [entity_url(iri) for iri in products.iris[rows]]
+    st.dataframe(frame, use_container_width=True, hide_index=True,
+                 column_config={"Details": st.column_config.LinkColumn("Details", display_text="Open")})
+    st.caption(f"Compared on {', '.join(similarity.columns)} in {elapsed * 1000:.2f} ms.")
+
+
+def _show_facet_filters(products, bitmaps):
+    """
+    Multi-select facets with live counts and range sliders. Returns the
+    selections, the active ranges (column -> (low, high) in column units)
+    and the bitset of the matching rows.
+    """
+    # the widgets' current values are in the session state before they are drawn,
+    # so every option can show how many cards it would leave
+    selections = {facet: st.session_state.get(f"facet_{facet}", []) for facet in bitmaps.bitsets}
+
+    ranges, range_sets = {}, []
+    bounds = {}
+    for label, (column, scale) in RANGE_FILTERS.items():
+        values = products.columns.get(column)
+        # no slider for a column without values (an empty table, or a release without it)
+        # or with a single value: there is nothing to restrict
+        if values is None or np.isnan(values).all():
+            continue
+        full = (int(np.nanmin(values) // scale), int(-(-np.nanmax(values) // scale)))
+        if full[0] >= full[1]:
+            continue
+        bounds[label] = full
+        low, high = st.session_state.get(f"range_{label}", full)
+        if not full[0] <= low <= high <= full[1]:
+            # a span kept from another release may lie outside this table's values
+            del st.session_state[f"range_{label}"]
+            low, high = full
+        # the full span means no restriction, so cards without the value stay in
+        if (low, high) != full:
+            ranges[column] = (low * scale, high * scale)
+            range_sets.append(range_bits(products, column, low * scale, high * scale))
+
+    live = bitmaps.live_counts(selections, range_sets)
+
+    st.write("### Filter settings")
+    cols = st.columns(3)
+    for i, (facet, prompt) in enumerate(FACET_PROMPTS.items()):
+        counts = live[facet]
+        cols[i % 3].multiselect(prompt, list(bitmaps.bitsets[facet]), key=f"facet_{facet}",
+                                format_func=lambda value, counts=counts: f"{value} ({counts.get(value, 0):,})")
+
+    cols = st.columns(max(len(bounds), 1))
+    for col, (label, full) in zip(cols, bounds.items()):
+        col.slider(label, min_value=full[0], max_value=full[1], value=full, key=f"range_{label}")
+
+    return selections, ranges, bitmaps.combine(selections, range_sets)
+
+
+def _sorted_rows(products, rank_index, rows, column, descending=False):
+    """
+    rows ordered by a column, rows without a value last. Numeric columns
+    with a rank index are read off its presorted order instead of sorting.
+    """
+    mask = np.zeros(len(products), dtype=bool)
+    mask[rows] = True
+    if column in rank_index.order:
+        ordered = rank_index.select(column, mask)
+    else:
+        ordered = products.ranked(mask, column)
+    if descending:
+        ordered = ordered[::-1]
+    missing = rows[~products.present(column)[rows]]
+    return np.concatenate([ordered, missing]).astype(int)
+
+
+def _page_frame(products, rows, columns):
+    """DataFrame of the given rows only; columns maps a header to a product table column."""
+    frame = {}
+    for label, column in columns.items():
+        values = products.columns[column][rows]
+        frame[label] = pd.array(values, dtype="Int64") if column == "releaseYear" else values
+    return pd.DataFrame(frame)
+
+
+def _show_result_table(products, rank_index, rows, value_label=None, value_column=None):
+    """
+    One page of the results. Sorting and column projection happen on row
+    indices, so only the visible rows are turned into a DataFrame and sent.
+    """
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    labels = c1.multiselect("Columns:", list(TABLE_COLUMNS), default=DEFAULT_TABLE_COLUMNS, key="wiki_columns")
+    columns = {label: TABLE_COLUMNS[label] for label in labels}
+    if value_label is not None:
+        columns[value_label] = value_column
+    sort_by = c2.selectbox("Sort by:", ["Result order"] + list(columns), key="wiki_sort")
+    descending = c2.checkbox("Descending", key="wiki_descending")
+    page_size = c3.selectbox("Rows per page:", PAGE_SIZES, key="wiki_page_size")
+
+    # back to the first page when the filters change the results
+    signature = hash((rows.tobytes(), value_column))
+    if st.session_state.get("wiki_results") != signature:
+        st.session_state.wiki_results = signature
+        st.session_state.wiki_page = 1
+    pages = max(1, -(-len(rows) // page_size))
+    if st.session_state.get("wiki_page", 1) > pages:
+        st.session_state.wiki_page = pages
+    page = c4.number_input(f"Page (of {pages:,}):", min_value=1, max_value=pages, step=1, key="wiki_page")
+
+    if sort_by != "Result order" and sort_by in columns:
+        rows = _sorted_rows(products, rank_index, rows, columns[sort_by], descending)
+    elif descending:
+        rows = rows[::-1]
+    start = (page - 1) * page_size
+    window = rows[start:start + page_size]
+
+    frame = _page_frame(products, window, columns)
+    frame["Details"] = [entity_url(iri) for iri in products.iris[window]]
+    st.dataframe(frame, use_container_width=True, hide_index=True,
+                 column_config={"Details": st.column_config.LinkColumn("Details", display_text="Open")})
+    st.caption(f"Rows {start + 1:,}–{start + len(window):,} of {len(rows):,}.")
+
+
+def show_wiki(g, EX, SCHEMA, products=None, rank_index=None, name_search=None, bitmaps=None,
+              similarity=None):
     st.subheader("GPU Encyclopedia")
 
+    if products is None:
+        products = build_product_table(g)
+    if rank_index is None:
+        rank_index = build_rank_index(products)
+    if name_search is None:
+        name_search = build_name_search(products)
+    if bitmaps is None:
+        bitmaps = build_bitmap_index(products)
+    if similarity is None:
+        similarity = build_similarity_index(products)
+
     if "rank_by_key" not in st.session_state:
         st.session_state.rank_by_key = "None"
     if "run_search" not in st.session_state:
@@ -15,155 +234,81 @@ def show_wiki(g, EX, SCHEMA):
         st.session_state.run_search = True
 
 
+    show_name_search(products, name_search)
+    show_similar(products, similarity)
 
-    # --- 1. UI outside form ---
-    st.write("### Filter settings")
-    filter_type = st.selectbox("Filter by:", 
-        ["All", "Brand", "Architecture", "Release Year", "Memory Size", "Memory Type", "Memory Bus"])
-
+    # --- 1. Facets, outside the form so their counts follow every change ---
+    t = time.perf_counter()
+    selections, ranges, selected = _show_facet_filters(products, bitmaps)
+    filter_s = time.perf_counter() - t
 
     # --- 2. Form ---
     with st.form("wiki_filter_form"):
         col_f1, col_f2 = st.columns(2)
-        
         with col_f1:
-            filter_value = None
-            if filter_type == "Brand":
-                q_brands = "SELECT DISTINCT ?name WHERE { ?gpu <https://schema.org/manufacturer> ?b . ?b <https://schema.org/name> ?name . }"
-                brands = [str(r.name) for r in g.query(q_brands)]
-                filter_value = st.selectbox("Select brand:", sorted(brands))
-            elif filter_type == "Architecture":
-                q_archs = "SELECT DISTINCT ?name WHERE { ?gpu <http://example.org/gpu/hasArchitecture> ?a . ?a <https://schema.org/name> ?name . }"
-                archs = [str(r.name) for r in g.query(q_archs)]
-                filter_value = st.selectbox("Select architecture:", sorted(archs))
-            elif filter_type == "Release Year":
-                q_years = "SELECT DISTINCT ?year WHERE { ?gpu <http://example.org/gpu/releaseYear> ?year . }"
-                years = [str(r.year) for r in g.query(q_years)]
-                filter_value = st.selectbox("Select year:", sorted(years))
-
-            elif filter_type == "Memory Size":
-                q_m_sizes = """
-                SELECT DISTINCT ?label WHERE { 
-                    ?gpu <http://example.org/gpu/memorySize> ?ms . 
-                    OPTIONAL { ?ms <https://schema.org/name> ?name }
-                    BIND(COALESCE(STR(?name), STR(?ms)) AS ?label)
-                }"""
-                m_sizes = [str(r.label).split('/')[-1].split('#')[-1] for r in g.query(q_m_sizes)]
-                filter_value = st.selectbox("Select VRAM:", sorted(list(set(m_sizes))))
-
-            elif filter_type == "Memory Type":
-                q_m_types = "SELECT DISTINCT ?type WHERE { ?gpu <http://example.org/gpu/memoryType> ?type . }"
-                m_types = [str(r.type) for r in g.query(q_m_types)]
-                filter_value = st.selectbox("Select memory type:", sorted(m_types))
-
-            elif filter_type == "Memory Bus":
-                # Oprava: Hledáme, co mají karty v ex:memBus
-                q_m_buses = """
-                SELECT DISTINCT ?label WHERE { 
-                    ?gpu <http://example.org/gpu/memBus> ?mb . 
-                    OPTIONAL { ?mb <https://schema.org/name> ?name }
-                    BIND(COALESCE(STR(?name), STR(?mb)) AS ?label)
-                }"""
-                m_buses = [str(r.label).split('/')[-1].split('#')[-1] for r in g.query(q_m_buses)]
-                filter_value = st.selectbox("Select bus width:", sorted(list(set(m_buses))))
-
-            else:
-                st.write("No additional settings needed.")
-
-
-        with col_f2:
             rank_by = st.selectbox("Ranking criteria:", 
-                                   ["None", "Performance (GFLOPS)", "TDP (W)", "Price ($)", "Number of cores"],
+                                   ["None"] + list(RANK_CRITERIA),
                                    key="rank_by_key")
+        with col_f2:
+            top_n = st.number_input("Show top N when ranking (0 = all):", min_value=0, value=0, step=5)
 
         # submit button
         submitted = st.form_submit_button("Show results")
 
-    # --- 3. Logic and display (executes only after submission) ---
-    if submitted or st.session_state.get("run_search", False):
-        st.session_state.run_search = False
-        rank_map = {
-            "Performance (GFLOPS)": "ex:fp32GFlops",
-            "TDP (W)": "ex:tdpWatts",
-            "Price ($)": "schema:price",
-            "Number of cores": "ex:shadingUnits"
-        }
+    # --- 3. Logic and display (after the first submission results follow the filters) ---
+    if submitted:
+        st.session_state.run_search = True
+    if st.session_state.run_search:
         is_ranking = rank_by != "None"
-        target_predicate = rank_map[rank_by] if is_ranking else "schema:name"
-
-        # Build filter clause
-        filter_clause = ""
-        if filter_type == "Brand":
-            filter_clause = f'?brand_uri <https://schema.org/name> ?bn . FILTER(STR(?bn) = "{filter_value}")'
-        elif filter_type == "Architecture":
-            filter_clause = f'?arch_uri <https://schema.org/name> ?an . FILTER(STR(?an) = "{filter_value}")'
-        elif filter_type == "Release Year":
-            filter_clause = f'FILTER(?year = {filter_value})'
-        elif filter_type == "Memory Size":
-            filter_clause = f'?gpu <http://example.org/gpu/memorySize> ?ms . FILTER(CONTAINS(STR(?ms), "{filter_value}"))'
-        elif filter_type == "Memory Type":
-            filter_clause = f'?gpu <http://example.org/gpu/memoryType> ?mt . FILTER(STR(?mt) = "{filter_value}")'
-        elif filter_type == "Memory Bus":
-            filter_clause = f'?gpu <http://example.org/gpu/memBus> ?mb . FILTER(CONTAINS(STR(?mb), "{filter_value}"))'
-
-        main_query = f"""
-        PREFIX ex: <http://example.org/gpu/>
-        PREFIX schema: <https://schema.org/>
-        SELECT DISTINCT ?gpu ?name ?val ?year WHERE {{
-            ?gpu a schema:Product ;
-                 schema:name ?name ;
-                 {target_predicate} ?val .
-            
-            OPTIONAL {{ ?gpu schema:manufacturer ?brand_uri }}
-            OPTIONAL {{ ?gpu ex:hasArchitecture ?arch_uri }}
-            OPTIONAL {{ ?gpu ex:releaseYear ?year }}
-            {filter_clause}
-        }} ORDER BY ?val
-        """
-
-        @st.cache_data(hash_funcs={Graph: id})
-        def run_dynamic_query(query_str, ranking_active):
-            res = g.query(query_str)
-            data = []
-            for r in res:
-                row = {
-                    "Name": str(r.name),
-                    "Year": int(r.year.toPython()) if r.year and hasattr(r.year, 'toPython') else (int(r.year) if r.year else None)
-                }
-                if ranking_active:
-                    row["Value"] = float(r.val.toPython()) if hasattr(r.val, 'toPython') else float(r.val)
-                else:
-                    row["Value"] = str(r.val)
-                data.append(row)
-            return data
-
-        results_list = run_dynamic_query(main_query, is_ranking)
-        df = pd.DataFrame(results_list)
-
-
-
-
-        if not df.empty:
-            st.success(f"{len(df)} GPUs found.")
+        target_predicate = RANK_CRITERIA[rank_by] if is_ranking else "schema:name"
+
+        main_query = build_facet_query(selections, ranges, products.predicates, target_predicate)
+
+        # filtering runs on the facet bitmaps, ranking on the presorted rank
+        # indexes; the SPARQL query is the equivalent of the full listing
+        t = time.perf_counter()
+        target_column = target_predicate.split(":")[-1]
+        mask = unpack(selected, len(products))
+        if is_ranking:
+            rows = rank_index.select(target_column, mask)
+            percentiles = rank_index.quantiles(target_column, mask=mask)
+            shown = rank_index.top_k(target_column, top_n, mask) if top_n else rows
+        else:
+            rows = shown = products.ranked(mask, target_column)
+        elapsed = filter_s + time.perf_counter() - t
+        record_query("wiki", main_query, elapsed, rows=len(rows), session_id=current_session_id())
+
+        with st.expander("Equivalent SPARQL query"):
+            st.code(main_query, language="sparql")
+
+        if len(shown):
+            if is_ranking and top_n:
+                st.success(f"{len(rows)} GPUs found, showing the top {len(shown)}.")
+            else:
+                st.success(f"{len(rows)} GPUs found.")
 
             if is_ranking:
                 st.write(f"### Statistics: {rank_by}")
+                unit = rank_by.split()[-1]
+                names, values = products.columns["name"], products.columns[target_column]
                 cols = st.columns(3)
-                worst, median, best = df.iloc[0], df.iloc[len(df)//2], df.iloc[-1]
-                cols[0].metric(label="Highest", value=best['Name'])
-                cols[0].caption(f"{best['Value']} {rank_by.split()[-1]}")
-                cols[1].metric(label="Median", value=median['Name'])
-                cols[1].caption(f"{median['Value']} {rank_by.split()[-1]}")
-                cols[2].metric(label="Lowest", value=worst['Name'])
-                cols[2].caption(f"{worst['Value']} {rank_by.split()[-1]}")
-            
-            display_df = df.copy()
+                worst, median, best = rows[0], rows[len(rows)//2], rows[-1]
+                cols[0].metric(label="Highest", value=names[best])
+                cols[0].caption(f"{values[best]} {unit}")
+                cols[1].metric(label="Median", value=names[median])
+                cols[1].caption(f"{values[median]} {unit}")
+                cols[2].metric(label="Lowest", value=names[worst])
+                cols[2].caption(f"{values[worst]} {unit}")
+
+                pcols = st.columns(len(DEFAULT_PERCENTILES))
+                for col, (p, value) in zip(pcols, percentiles.items()):
+                    col.metric(label=f"P{p}", value=f"{value:,.1f}")
+                st.caption(f"Served from the facet bitmaps and presorted index in {elapsed * 1000:.3f} ms.")
+
             if is_ranking:
-                display_df = display_df.rename(columns={"Value": rank_by})
+                _show_result_table(products, rank_index, shown, rank_by, target_column)
             else:
-                display_df = display_df.drop(columns=["Value"])
-            
-            st.dataframe(display_df, use_container_width=True)
+                _show_result_table(products, rank_index, shown)
         else:
             if is_ranking:
                 st.info(f"No results found. The Criteria '{rank_by}' might be missing for these cards. Removing it might show something.")